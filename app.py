@@ -1,19 +1,44 @@
-from flask import Flask, request, jsonify, send_from_directory, redirect, make_response
+from flask import Flask, request, jsonify, send_file, redirect, make_response, Response, stream_with_context
 from flask_cors import CORS
+import click
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.dialects.postgresql import ARRAY
-from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, insert as pg_insert
+from sqlalchemy.orm import deferred
+from sqlalchemy import text, func, and_, or_, tuple_, update
 from sqlalchemy.exc import IntegrityError
 import os
-from datetime import datetime
+import sys
+import gzip
+import mimetypes
+import mmap
+import struct
+import tempfile
+from datetime import datetime, timedelta
 import hashlib
+import codecs
+import base64
+import zlib
+import multiprocessing
+from itertools import islice
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+
+try:
+    import brotli  # optional: .br variants are only built when available
+except ImportError:
+    brotli = None
 import threading
 from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import time
-from collections import defaultdict
+from collections import OrderedDict
 import logging
+import re
+import ipaddress
+import select
+import psycopg2
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -41,12 +66,135 @@ ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
 # Example: ALLOWED_IPS=123.45.67.89,98.76.54.32
 INITIAL_IPS = os.getenv('ALLOWED_IPS', '').split(',') if os.getenv('ALLOWED_IPS') else []
 
-# In-memory whitelist (will be synced with DB)
-allowed_ips = set(ip.strip() for ip in INITIAL_IPS if ip.strip())
-
 # Always allow these
 ALWAYS_ALLOWED = {'127.0.0.1', 'localhost'}
 
+# Postgres channel used to tell all workers the whitelist changed
+IP_ALLOWLIST_CHANNEL = 'allowed_ips_changed'
+
+# Fallback full reload interval in case a notification is missed
+IP_ALLOWLIST_REFRESH_SECONDS = int(os.getenv('IP_ALLOWLIST_REFRESH_SECONDS', '30'))
+
+class IPPrefixTrie:
+    """Binary trie over address bits for CIDR matching (e.g. 10.0.0.0/8)"""
+    def __init__(self):
+        self.roots = {4: {}, 6: {}}
+    
+    def insert(self, network):
+        node = self.roots[network.version]
+        bits = int(network.network_address)
+        width = network.max_prefixlen
+        for i in range(network.prefixlen):
+            node = node.setdefault((bits >> (width - 1 - i)) & 1, {})
+        node['end'] = True
+    
+    def contains(self, address):
+        node = self.roots[address.version]
+        if 'end' in node:
+            return True
+        bits = int(address)
+        width = address.max_prefixlen
+        for i in range(width):
+            node = node.get((bits >> (width - 1 - i)) & 1)
+            if node is None:
+                return False
+            if 'end' in node:
+                return True
+        return False
+
+class IPAllowlistSnapshot:
+    """
+    Immutable view of the whitelist. Workers never mutate it - a refresh
+    builds a new snapshot and swaps the global reference.
+    """
+    def __init__(self, entries, enforced, version=0):
+        exact = set()
+        networks = IPPrefixTrie()
+        has_networks = False
+        for entry in entries:
+            entry = entry.strip()
+            if not entry:
+                continue
+            if '/' in entry:
+                try:
+                    networks.insert(ipaddress.ip_network(entry, strict=False))
+                    has_networks = True
+                except ValueError:
+                    logger.warning(f"Invalid CIDR in whitelist: {entry}")
+            else:
+                exact.add(entry)
+        self.entries = frozenset(e.strip() for e in entries if e.strip())
+        self.exact = frozenset(exact)
+        self.networks = networks if has_networks else None
+        # Whitelist is enforced once any IP is configured (active or not)
+        self.enforced = enforced or bool(self.exact) or has_networks
+        self.version = version
+    
+    def allows(self, ip):
+        if ip in self.exact:
+            return True
+        if self.networks is None:
+            return False
+        try:
+            return self.networks.contains(ipaddress.ip_address(ip))
+        except ValueError:
+            return False
+
+class DeniedIPCache:
+    """
+    Bounded TTL/LRU cache of denied addresses, so scanners hitting the app
+    repeatedly skip the CIDR lookup. Entries computed against a snapshot
+    older than the last purge are ignored.
+    """
+    def __init__(self, max_size=10000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.min_version = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def contains(self, ip):
+        now = time.monotonic()
+        with self.lock:
+            expires = self.entries.get(ip)
+            if expires is not None and expires > now:
+                self.entries.move_to_end(ip)
+                self.hits += 1
+                return True
+            if expires is not None:
+                del self.entries[ip]
+            self.misses += 1
+            return False
+    
+    def add(self, ip, version):
+        with self.lock:
+            if version < self.min_version:
+                return
+            self.entries[ip] = time.monotonic() + self.ttl
+            self.entries.move_to_end(ip)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def purge(self, version):
+        with self.lock:
+            self.min_version = version
+            self.entries.clear()
+    
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+denied_ip_cache = DeniedIPCache(
+    max_size=int(os.getenv('DENIED_IP_CACHE_SIZE', '10000')),
+    ttl=int(os.getenv('DENIED_IP_CACHE_TTL', '300'))
+)
+
+# In-memory whitelist snapshot (reloaded from DB by refresh_ip_allowlist)
+ip_allowlist = IPAllowlistSnapshot(INITIAL_IPS, enforced=False)
+ip_allowlist_lock = threading.Lock()
+
 # Paths that don't require IP check
 PUBLIC_PATHS = {'/api/health', '/blocked', '/admin/login', '/admin/auth'}
 
@@ -54,62 +202,310 @@ PUBLIC_PATHS = {'/api/health', '/blocked', '/admin/login', '/admin/auth'}
 import json
 import random
 
+# Compact snapshot of academo_questions.json, mmapped by every worker
+ACADEMO_SNAPSHOT_DIR = os.getenv('ACADEMO_SNAPSHOT_DIR', tempfile.gettempdir())
+ACADEMO_SNAPSHOT_MAGIC = b'ACADEMO2'
+# How often to check the JSON file for changes (0 disables hot reload)
+ACADEMO_RELOAD_SECONDS = int(os.getenv('ACADEMO_RELOAD_SECONDS', '30'))
+
+class AcademoQuestion:
+    """
+    Compact per-question record. Only what lookups and answer checks need
+    lives in the worker; the JSON payload stays in the shared snapshot.
+    """
+    __slots__ = ('id', 'category', 'answer', 'correct', 'head', 'options', 'explanation')
+    
+    def __init__(self, question_id, category, answer, head, options, explanation):
+        self.id = sys.intern(question_id)
+        self.category = sys.intern(category)
+        self.answer = answer  # correct answer as given in the JSON (string or list)
+        # Pre-normalized for checks: stripped string, or frozenset for multi-select
+        if isinstance(answer, list):
+            self.correct = frozenset(AcademoStore.normalize(a) for a in answer)
+        else:
+            self.correct = AcademoStore.normalize(answer)
+        self.head = head  # (offset, length) of the JSON fragment before the options
+        self.options = options  # tuple of (offset, length), one per option
+        self.explanation = explanation  # (offset, length) of the UTF-8 explanation text
+
+class AcademoStore:
+    """
+    Indexed, read-only Academo question bank: id lookup, per-category lists,
+    precomputed counts and pre-normalized correct answers. Encoded question
+    fragments are read from `blob` (an mmap shared by all workers).
+    """
+    def __init__(self, questions=(), blob=b'', version='', modified=None, source_stat=None):
+        self.questions = tuple(questions)
+        self.blob = blob
+        self.version = version  # content hash of the JSON file, used as ETag
+        self.modified = modified
+        self.source_stat = source_stat  # (mtime_ns, size) of the JSON file
+        self.by_id = {}
+        for q in self.questions:
+            self.by_id.setdefault(q.id, q)  # first wins on duplicate ids, like the old linear scan
+        by_category = {}
+        for q in self.questions:
+            by_category.setdefault(q.category, []).append(q)
+        self.by_category = {cat: tuple(items) for cat, items in by_category.items()}
+        self.category_counts = {cat: len(items) for cat, items in self.by_category.items()}
+    
+    @staticmethod
+    def normalize(answer):
+        return answer.strip() if isinstance(answer, str) else answer
+    
+    def fragment(self, span):
+        offset, length = span
+        return self.blob[offset:offset + length]
+    
+    def encode(self, question, permutation=None):
+        """Question JSON assembled from the snapshot, options optionally reordered"""
+        order = permutation if permutation is not None else range(len(question.options))
+        return self.fragment(question.head) \
+            + b', '.join(self.fragment(question.options[i]) for i in order) + b']}'
+    
+    def get(self, question_id):
+        """Full question dict (decoded on demand from the snapshot)"""
+        question = self.by_id.get(question_id)
+        return json.loads(self.encode(question)) if question else None
+    
+    def in_category(self, category):
+        if not category or category == 'all':
+            return self.questions
+        return self.by_category.get(category, ())
+    
+    def is_correct(self, question_id, user_answer):
+        """Hash lookup + set/string compare against the pre-normalized answer"""
+        correct = self.by_id[question_id].correct
+        
+        # Multi-select: user_answer should be a list
+        if isinstance(correct, frozenset):
+            if not isinstance(user_answer, list) or not all(isinstance(a, str) for a in user_answer):
+                return False
+            return frozenset(self.normalize(a) for a in user_answer) == correct
+        
+        # Single select - if user sent array, take first element
+        if isinstance(user_answer, list):
+            user_answer = user_answer[0] if user_answer else None
+        return isinstance(user_answer, str) and user_answer.strip() == correct
+
+def encode_academo_snapshot(questions, version, modified):
+    """
+    Snapshot bytes: magic, header length, JSON header with per-question
+    records (ids, categories, answers, fragment offsets), then the blob of
+    pre-encoded fragments. `modified` is the source file's st_mtime.
+    """
+    blob = bytearray()
+    
+    def append(fragment):
+        span = [len(blob), len(fragment)]
+        blob.extend(fragment)
+        return span
+    
+    records = []
+    for q in questions:
+        fields = {k: v for k, v in q.items() if k != 'options'}
+        head = json.dumps(fields, ensure_ascii=False)[:-1] + ', "options": ['
+        records.append([
+            q['id'], q['category'], q['correct'],
+            append(head.encode('utf-8')),
+            [append(json.dumps(opt, ensure_ascii=False).encode('utf-8')) for opt in q['options']],
+            append(q.get('explanation', '').encode('utf-8'))
+        ])
+    
+    header = json.dumps({
+        'version': version,
+        'modified': modified,
+        'records': records
+    }, ensure_ascii=False).encode('utf-8')
+    
+    return ACADEMO_SNAPSHOT_MAGIC + struct.pack('<I', len(header)) + header + bytes(blob)
+
+def build_academo_snapshot(snapshot, path):
+    """Write via temp file + rename, so concurrent builders never expose a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(snapshot)
+    os.replace(tmp_path, path)
+
+def parse_academo_snapshot(blob, source_stat=None):
+    """Build the store index from a snapshot's header (blob: mmap or bytes)"""
+    magic_len = len(ACADEMO_SNAPSHOT_MAGIC)
+    if blob[:magic_len] != ACADEMO_SNAPSHOT_MAGIC:
+        raise ValueError("Not an Academo snapshot")
+    (header_len,) = struct.unpack('<I', blob[magic_len:magic_len + 4])
+    base = magic_len + 4 + header_len
+    header = json.loads(blob[magic_len + 4:base])
+    
+    questions = []
+    for question_id, category, answer, head, options, explanation in header['records']:
+        questions.append(AcademoQuestion(
+            question_id, category, answer,
+            (base + head[0], head[1]),
+            tuple((base + offset, length) for offset, length in options),
+            (base + explanation[0], explanation[1])
+        ))
+    
+    return AcademoStore(
+        questions, blob,
+        version=header['version'],
+        # Naive UTC, as everywhere else in the app
+        modified=datetime.utcfromtimestamp(header['modified']),
+        source_stat=source_stat
+    )
+
+def open_academo_snapshot(path, source_stat=None):
+    """Map a snapshot file read-only and index it"""
+    with open(path, 'rb') as f:
+        blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return parse_academo_snapshot(blob, source_stat)
+    except ValueError:
+        blob.close()
+        raise
+
+def remove_stale_academo_snapshots(keep):
+    """Delete snapshots of older versions (workers still mapping them are unaffected)"""
+    for name in os.listdir(ACADEMO_SNAPSHOT_DIR):
+        if name.startswith('academo-') and name.endswith('.snap') and name != keep:
+            try:
+                os.remove(os.path.join(ACADEMO_SNAPSHOT_DIR, name))
+            except OSError:
+                pass
+
 # Add this function to load questions from JSON
 def load_academo_questions():
-    """Load Academo questions from JSON file"""
+    """
+    Load Academo questions from JSON file. The first worker to see a new
+    version builds its snapshot; the rest just map the existing file.
+    """
     json_path = os.path.join(app.static_folder, 'academo_questions.json')
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data['questions']
+        stat = os.stat(json_path)
+        with open(json_path, 'rb') as f:
+            raw = f.read()
+        version = hashlib.sha256(raw).hexdigest()[:32]
+        source_stat = (stat.st_mtime_ns, stat.st_size)
+        
+        name = f"academo-{version}.snap"
+        path = os.path.join(ACADEMO_SNAPSHOT_DIR, name)
+        try:
+            return open_academo_snapshot(path, source_stat)
+        except (OSError, ValueError):
+            pass
+        
+        data = json.loads(raw)
+        snapshot = encode_academo_snapshot(data['questions'], version, stat.st_mtime)
+        try:
+            build_academo_snapshot(snapshot, path)
+            remove_stale_academo_snapshots(keep=name)
+            return open_academo_snapshot(path, source_stat)
+        except (OSError, ValueError) as e:
+            # Snapshot dir not writable - serve from a private in-memory copy
+            logger.error(f"Academo snapshot unavailable, using in-memory copy: {e}")
+            return parse_academo_snapshot(snapshot, source_stat)
     except FileNotFoundError:
         logger.error(f"Academo questions file not found: {json_path}")
-        return []
+        return AcademoStore()
     except json.JSONDecodeError as e:
         logger.error(f"Error parsing academo_questions.json: {e}")
-        return []
+        return AcademoStore()
+
+def reload_academo_questions():
+    """
+    Swap in a new store if academo_questions.json changed. Requests hold
+    their own reference to the store, so none sees a half-loaded bank.
+    """
+    global academo_store
+    json_path = os.path.join(app.static_folder, 'academo_questions.json')
+    try:
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        return False
+    if academo_store.source_stat == (stat.st_mtime_ns, stat.st_size):
+        return False
+    
+    store = load_academo_questions()
+    if not store.questions and academo_store.questions:
+        # Broken or half-written file - keep serving the current bank
+        return False
+    previous, academo_store = academo_store, store
+    if store.version != previous.version:
+        logger.info(f"Reloaded {len(store.questions)} Academo questions (version {store.version[:8]})")
+        return True
+    return False
+
+def academo_reload_watcher(interval=ACADEMO_RELOAD_SECONDS):
+    """Background thread: pick up edits to academo_questions.json without a redeploy"""
+    while True:
+        time.sleep(interval)
+        try:
+            reload_academo_questions()
+        except Exception as e:
+            logger.error(f"Academo reload error: {e}")
 
 # Load questions at startup
-ACADEMO_QUESTIONS = load_academo_questions()
-logger.info(f"Loaded {len(ACADEMO_QUESTIONS)} Academo questions")
+academo_store = load_academo_questions()
+logger.info(f"Loaded {len(academo_store.questions)} Academo questions")
 
 # Add these routes (replace the old ones if they exist)
 
 @app.route('/api/academo/questions', methods=['GET'])
 def get_academo_questions():
-    """Get all Academo questions or filtered by category"""
+    """
+    Get Academo questions (optionally by category) in shuffled order.
+    `seed` makes the question and option order reproducible; without it a
+    seed is generated and returned. `offset`/`limit` select a slice.
+    """
     category = request.args.get('category', None)
+    seed = request.args.get('seed', type=int)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = max(0, request.args.get('limit', 0, type=int))  # 0 = all
+    store = academo_store
+    
+    if seed is None:
+        # Fresh random shuffle per request: nothing to validate or share,
+        # every client must get its own order
+        response = Response(
+            iter_academo_questions_json(store, category, random.getrandbits(32), offset, limit),
+            mimetype='application/json'
+        )
+        response.cache_control.no_store = True
+        response.cache_control.private = True
+        return response
     
-    questions = ACADEMO_QUESTIONS.copy()
-    
-    if category and category != 'all':
-        questions = [q for q in questions if q['category'] == category]
-    
-    # Shuffle questions for randomness
-    random.shuffle(questions)
-    
-    # Shuffle options for each question
-    result = []
-    for q in questions:
-        q_copy = q.copy()
-        options = q_copy['options'].copy()
-        random.shuffle(options)
-        q_copy['options'] = options
-        result.append(q_copy)
-    
-    # Get category counts
-    categories = {}
-    for q in ACADEMO_QUESTIONS:
-        cat = q['category']
-        if cat not in categories:
-            categories[cat] = 0
-        categories[cat] += 1
-    
-    return jsonify({
-        'questions': result,
-        'total': len(result),
-        'categories': categories
-    })
+    # Seeded responses are deterministic: strong ETag, cacheable
+    return conditional_json(
+        lambda: Response(
+            iter_academo_questions_json(store, category, seed, offset, limit),
+            mimetype='application/json'
+        ),
+        make_etag('academo-questions', store.version, category, seed, offset, limit),
+        max_age=300, last_modified=store.modified
+    )
+
+def iter_academo_questions_json(store, category, seed, offset, limit):
+    """
+    Stream the questions payload. Shuffles an index array and per-question
+    option permutations; question bodies come straight from the snapshot.
+    """
+    questions = store.in_category(category)
+    order = list(range(len(questions)))
+    random.Random(seed).shuffle(order)
+    page = order[offset:offset + limit] if limit else order[offset:]
+    
+    yield b'{"questions": ['
+    for n, index in enumerate(page):
+        question = questions[index]
+        permutation = list(range(len(question.options)))
+        random.Random(f'{seed}:{question.id}').shuffle(permutation)
+        yield (b'' if n == 0 else b', ') + store.encode(question, permutation)
+    yield b'], ' + json.dumps({
+        'total': len(questions),
+        'offset': offset,
+        'limit': limit or None,
+        'seed': seed,
+        'categories': store.category_counts
+    })[1:].encode('utf-8')
 
 @app.route('/api/academo/check', methods=['POST'])
 def check_academo_answer():
@@ -117,62 +513,43 @@ def check_academo_answer():
     data = request.get_json()
     question_id = data.get('questionId')
     user_answer = data.get('answer')
-    is_multi_select = data.get('isMultiSelect', False)
     
     if not question_id or user_answer is None:
         return jsonify({'error': 'Missing questionId or answer'}), 400
     
-    question = next((q for q in ACADEMO_QUESTIONS if q['id'] == question_id), None)
+    if not isinstance(question_id, str):
+        return jsonify({'error': 'questionId must be a string'}), 400
+    
+    store = academo_store
+    question = store.by_id.get(question_id)
     
     if not question:
         return jsonify({'error': 'Question not found'}), 404
     
-    correct_answer = question['correct']
-    
-    # Handle multi-select questions
-    if isinstance(correct_answer, list):
-        # Multi-select: user_answer should be a list
-        if isinstance(user_answer, list):
-            # Sort both for comparison
-            user_set = set(a.strip() if isinstance(a, str) else a for a in user_answer)
-            correct_set = set(a.strip() if isinstance(a, str) else a for a in correct_answer)
-            is_correct = user_set == correct_set
-        else:
-            is_correct = False
-    else:
-        # Single select
-        if isinstance(user_answer, list):
-            # If user sent array for single select, take first element
-            is_correct = user_answer[0].strip() == correct_answer.strip() if user_answer else False
-        else:
-            is_correct = user_answer.strip() == correct_answer.strip()
-    
     return jsonify({
-        'correct': is_correct,
-        'correctAnswer': correct_answer,
-        'explanation': question['explanation']
+        'correct': store.is_correct(question_id, user_answer),
+        'correctAnswer': question.answer,
+        'explanation': store.fragment(question.explanation).decode('utf-8')
     })
 
 @app.route('/api/academo/stats', methods=['GET'])
 def academo_stats():
     """Get Academo statistics"""
-    categories = {}
-    for q in ACADEMO_QUESTIONS:
-        cat = q['category']
-        if cat not in categories:
-            categories[cat] = 0
-        categories[cat] += 1
-    
-    return jsonify({
-        'totalQuestions': len(ACADEMO_QUESTIONS),
-        'categories': categories
-    })
+    store = academo_store
+    return conditional_json(
+        lambda: {
+            'totalQuestions': len(store.questions),
+            'categories': store.category_counts
+        },
+        make_etag('academo-stats', store.version),
+        max_age=300, last_modified=store.modified
+    )
 
 # Add route for serving academo.html (before the catch-all route)
 @app.route('/academo.html')
 def academo_page():
     """Serve Academo page"""
-    return send_from_directory(app.static_folder, 'academo.html')
+    return send_static_asset('academo.html')
 
 def get_client_ip():
     """Get real client IP behind proxy"""
@@ -181,21 +558,69 @@ def get_client_ip():
     return request.remote_addr or '127.0.0.1'
 
 def is_ip_allowed(ip):
-    """Check if IP is in whitelist"""
+    """Check if IP is in whitelist (in-memory only, no DB access)"""
     if ip in ALWAYS_ALLOWED:
         return True
-    if ip in allowed_ips:
+    snapshot = ip_allowlist
+    if denied_ip_cache.contains(ip):
+        return False
+    if snapshot.allows(ip):
         return True
-    # Check DB for allowed IPs
-    try:
-        db_ip = AllowedIP.query.filter_by(ip_address=ip, is_active=True).first()
-        if db_ip:
-            allowed_ips.add(ip)  # Cache it
-            return True
-    except:
-        pass
+    denied_ip_cache.add(ip, snapshot.version)
     return False
 
+def refresh_ip_allowlist():
+    """Rebuild the whitelist snapshot from DB and swap it in atomically"""
+    global ip_allowlist
+    try:
+        with app.app_context():
+            rows = db.session.query(AllowedIP.ip_address, AllowedIP.is_active).all()
+        active = [ip for ip, is_active in rows if is_active]
+        with ip_allowlist_lock:
+            previous = ip_allowlist
+            ip_allowlist = IPAllowlistSnapshot(
+                INITIAL_IPS + active,
+                enforced=bool(rows),
+                version=previous.version + 1
+            )
+            # An IP was added or activated - earlier denials may be wrong now
+            if not ip_allowlist.entries <= previous.entries:
+                denied_ip_cache.purge(ip_allowlist.version)
+    except Exception as e:
+        logger.error(f"Failed to refresh IP whitelist: {e}")
+
+def notify_ip_allowlist_changed():
+    """Queue a NOTIFY in the current transaction; delivered to all workers on commit"""
+    db.session.execute(text("SELECT pg_notify(:channel, '')"), {'channel': IP_ALLOWLIST_CHANNEL})
+
+def ip_allowlist_listener():
+    """Background thread: reload whitelist on NOTIFY, with a periodic fallback refresh"""
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(app.config['SQLALCHEMY_DATABASE_URI'])
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {IP_ALLOWLIST_CHANNEL}')
+            # Catch up on anything missed while disconnected
+            refresh_ip_allowlist()
+            
+            while True:
+                readable, _, _ = select.select([conn], [], [], IP_ALLOWLIST_REFRESH_SECONDS)
+                if readable:
+                    conn.poll()
+                    conn.notifies.clear()
+                refresh_ip_allowlist()
+        except Exception as e:
+            logger.warning(f"IP whitelist listener error: {e}")
+            time.sleep(5)
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
 @app.before_request
 def check_ip_whitelist():
     """Check if request IP is allowed"""
@@ -206,12 +631,7 @@ def check_ip_whitelist():
     client_ip = get_client_ip()
     
     # If no whitelist configured, allow all (for initial setup)
-    try:
-        has_any_ips = allowed_ips or AllowedIP.query.first()
-    except:
-        has_any_ips = bool(allowed_ips)
-    
-    if not has_any_ips:
+    if not ip_allowlist.enforced:
         return None
     
     if not is_ip_allowed(client_ip):
@@ -276,47 +696,287 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
 # OpenAI API Key from environment
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') or os.getenv('OPENAI')
 
+# Base URL can point at a local fake chat-completions server for testing
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1').rstrip('/')
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+
+# Max total seconds a request thread may sleep between OpenAI retries
+OPENAI_RETRY_BUDGET = float(os.getenv('OPENAI_RETRY_BUDGET', '10'))
+
 db = SQLAlchemy(app)
 
 # ============================================
 # RATE LIMITING & CONCURRENCY CONTROL
 # ============================================
-class RateLimiter:
-    """Simple in-memory rate limiter"""
-    def __init__(self, requests_per_minute=30):
-        self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
+def sliding_window_retry_after(previous, current, elapsed, limit, window):
+    """
+    Seconds until one more request fits under the sliding-window estimate
+    previous * (1 - elapsed / window) + current.
+    """
+    fraction = elapsed / window
+    
+    # Still fits in the current window once enough of the previous one slides out
+    if current + 1 <= limit and previous > 0:
+        needed = 1 - (limit - 1 - current) / previous
+        if needed <= 1:
+            return max(1, int((needed - fraction) * window + 0.999))
+    
+    # Otherwise wait for the next window, where `current` becomes the previous count
+    wait = (1 - fraction) * window
+    if current > 0:
+        wait += max(0.0, 1 - (limit - 1) / current) * window
+    return max(1, int(wait + 0.999))
+
+class MemoryRateLimitBackend:
+    """Per-process sliding-window counter: two counters per key, O(1) per call"""
+    def __init__(self):
+        self.counters = {}  # key -> [window_start, previous_count, current_count]
         self.lock = threading.Lock()
     
-    def is_allowed(self, key):
-        """Check if request is allowed"""
+    def hit(self, key, limit, window):
         now = time.time()
-        minute_ago = now - 60
+        window_start = int(now // window) * window
+        elapsed = now - window_start
         
         with self.lock:
-            # Clean old requests
-            self.requests[key] = [t for t in self.requests[key] if t > minute_ago]
+            counter = self.counters.get(key)
+            if counter is None:
+                counter = self.counters[key] = [window_start, 0, 0]
+            elif counter[0] != window_start:
+                # Roll forward; anything older than one window counts as zero
+                previous = counter[2] if counter[0] == window_start - window else 0
+                counter[:] = [window_start, previous, 0]
             
-            if len(self.requests[key]) >= self.requests_per_minute:
-                return False
+            estimate = counter[1] * (1 - elapsed / window) + counter[2]
+            if estimate + 1 > limit:
+                return False, sliding_window_retry_after(counter[1], counter[2], elapsed, limit, window)
             
-            self.requests[key].append(now)
-            return True
+            counter[2] += 1
+            return True, 0
+    
+    def sweep(self, window):
+        """Drop keys whose counters can no longer affect the limit"""
+        cutoff = int(time.time() // window) * window - window
+        with self.lock:
+            expired = [key for key, counter in self.counters.items() if counter[0] < cutoff]
+            for key in expired:
+                del self.counters[key]
+        return len(expired)
+    
+    def __len__(self):
+        return len(self.counters)
+
+class PostgresRateLimitBackend:
+    """
+    Sliding-window counter in an UNLOGGED table, shared by all gunicorn
+    workers and instances. Like the memory backend, only allowed requests
+    are counted, so retrying while limited doesn't extend the lockout.
+    """
+    def hit(self, key, limit, window):
+        now = time.time()
+        window_start = int(now // window) * window
+        elapsed = now - window_start
+        params = {'key': key, 'window_start': window_start, 'previous_start': window_start - window}
+        
+        with db.engine.begin() as conn:
+            # The previous window is closed, so reading it first is race-free
+            previous = conn.execute(text('''
+                SELECT count FROM rate_limit_counters
+                WHERE key = :key AND window_start = :previous_start
+            '''), params).scalar() or 0
+            
+            # Requests still allowed in the current window; the increment is
+            # conditional and checked under the row lock, so it can't overshoot
+            allowance = limit - previous * (1 - elapsed / window)
+            row = conn.execute(text('''
+                INSERT INTO rate_limit_counters (key, window_start, count)
+                SELECT :key, :window_start, 1 WHERE 1 <= :allowance
+                ON CONFLICT (key, window_start)
+                DO UPDATE SET count = rate_limit_counters.count + 1
+                WHERE rate_limit_counters.count + 1 <= :allowance
+                RETURNING count
+            '''), dict(params, allowance=allowance)).first()
+            
+            if row is None:
+                current = conn.execute(text('''
+                    SELECT count FROM rate_limit_counters
+                    WHERE key = :key AND window_start = :window_start
+                '''), params).scalar() or 0
+            
+            # Occasionally drop expired windows
+            if random.random() < 0.01:
+                conn.execute(
+                    text('DELETE FROM rate_limit_counters WHERE window_start < :cutoff'),
+                    {'cutoff': window_start - window}
+                )
+        
+        if row is None:
+            return False, sliding_window_retry_after(previous, current, elapsed, limit, window)
+        return True, 0
+
+class RateLimiter:
+    """Sliding-window rate limiter with a pluggable counter backend"""
+    def __init__(self, requests_per_minute=30, backend=None, window=60):
+        self.requests_per_minute = requests_per_minute
+        self.window = window
+        self.backend = backend or MemoryRateLimitBackend()
+        self.fallback = MemoryRateLimitBackend()
+    
+    def hit(self, key, limit=None):
+        """Register a request; returns (allowed, retry_after_seconds)"""
+        limit = limit or self.requests_per_minute
+        try:
+            return self.backend.hit(key, limit, self.window)
+        except Exception as e:
+            # Shared backend unavailable - degrade to a per-process limit
+            logger.error(f"Rate limit backend error: {e}")
+            return self.fallback.hit(key, limit, self.window)
+    
+    def is_allowed(self, key):
+        """Check if request is allowed"""
+        return self.hit(key)[0]
+    
+    def sweep(self):
+        """Expire idle in-memory counters"""
+        removed = self.fallback.sweep(self.window)
+        if isinstance(self.backend, MemoryRateLimitBackend):
+            removed += self.backend.sweep(self.window)
+        return removed
+    
+    def size(self):
+        """Number of keys tracked in process memory"""
+        size = len(self.fallback)
+        if isinstance(self.backend, MemoryRateLimitBackend):
+            size += len(self.backend)
+        return size
+
+# Rate limit backend: "postgres" (global across workers) or "memory" (per process)
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'postgres')
 
 # Global rate limiter for AI requests
-ai_rate_limiter = RateLimiter(requests_per_minute=60)  # 60 AI calls per minute total
+ai_rate_limiter = RateLimiter(
+    requests_per_minute=60,  # default per client per route
+    backend=PostgresRateLimitBackend() if RATE_LIMIT_BACKEND == 'postgres' else MemoryRateLimitBackend()
+)
+
+def rate_limit_sweeper(interval=60):
+    """Background thread: expire idle rate limit keys so memory stays flat"""
+    while True:
+        time.sleep(interval)
+        try:
+            ai_rate_limiter.sweep()
+        except Exception as e:
+            logger.error(f"Rate limit sweep error: {e}")
+
+class LockRegistry:
+    """
+    Per-key locks, reference counted: an entry is removed as soon as no
+    thread holds or waits on it, so keys don't pile up for the worker's life.
+    """
+    def __init__(self):
+        self.locks = {}  # key -> [lock, refcount]
+        self.lock = threading.Lock()
+    
+    @contextmanager
+    def hold(self, key):
+        with self.lock:
+            entry = self.locks.get(key)
+            if entry is None:
+                entry = self.locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self.locks[key]
+    
+    def __len__(self):
+        return len(self.locks)
 
 # Lock for preventing duplicate AI processing
-processing_locks = defaultdict(threading.Lock)
-processing_locks_lock = threading.Lock()
+processing_locks = LockRegistry()
 
 def get_processing_lock(question_id):
-    """Get or create a lock for a specific question"""
-    with processing_locks_lock:
-        return processing_locks[question_id]
+    """Get a lock context for a specific question (use with `with`)"""
+    return processing_locks.hold(question_id)
 
-def rate_limit(f):
-    """Decorator for rate limiting"""
+# Single-flight AI work across threads and workers (claim rows in ai_claims)
+AI_CLAIM_TTL = 120  # seconds; a claim older than the gunicorn timeout is stale
+AI_WAIT_TIMEOUT = float(os.getenv('AI_WAIT_TIMEOUT', '5'))  # max time a waiter blocks
+AI_POLL_INTERVAL = 0.25
+
+def claim_ai_work(key):
+    """
+    Try to become the only in-flight AI call for `key`. Returns True for the
+    claimant; everyone else should wait for the result instead of calling OpenAI.
+    """
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        row = conn.execute(text('''
+            INSERT INTO ai_claims (key, claimed_at)
+            VALUES (:key, :now)
+            ON CONFLICT (key) DO UPDATE SET claimed_at = EXCLUDED.claimed_at
+            WHERE ai_claims.claimed_at < :stale_before
+            RETURNING key
+        '''), {
+            'key': key,
+            'now': now,
+            'stale_before': now - timedelta(seconds=AI_CLAIM_TTL)
+        }).first()
+    return row is not None
+
+def release_ai_work(key):
+    """Release a claim taken with claim_ai_work"""
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(text('DELETE FROM ai_claims WHERE key = :key'), {'key': key})
+    except Exception as e:
+        # Claim expires after AI_CLAIM_TTL anyway
+        logger.error(f"Failed to release AI claim {key}: {e}")
+
+def wait_for_ai_result(fetch, timeout):
+    """Poll `fetch()` until it returns something truthy or `timeout` seconds pass"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = fetch()
+        if result or time.monotonic() >= deadline:
+            return result
+        # Don't sit idle in a transaction while waiting
+        db.session.rollback()
+        time.sleep(AI_POLL_INTERVAL)
+
+def wait_for_ai_cache(question_id, timeout, lang='en'):
+    """
+    Poll for an AICache row written by the claimant (with the Russian
+    explanation when lang='ru'), for at most `timeout` seconds
+    """
+    def fetch():
+        cache = db.session.get(AICache, question_id)
+        return cache if cache and (lang != 'ru' or cache.explanation_ru) else None
+    return wait_for_ai_result(fetch, timeout)
+
+def ai_pending_response(question_id, retry_after=2):
+    """202 telling the client the answer is being generated - poll again"""
+    response = jsonify({
+        'status': 'pending',
+        'questionId': question_id,
+        'retryAfter': retry_after
+    })
+    response.status_code = 202
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def rate_limit(f=None, *, requests_per_minute=None):
+    """
+    Decorator for rate limiting. Limits are tracked per client and route;
+    use @rate_limit(requests_per_minute=N) to override the default.
+    """
+    if f is None:
+        return lambda func: rate_limit(func, requests_per_minute=requests_per_minute)
+    
     @wraps(f)
     def decorated_function(*args, **kwargs):
         # Get client identifier (IP or some unique key)
@@ -324,15 +984,122 @@ def rate_limit(f):
         if client_ip:
             client_ip = client_ip.split(',')[0].strip()  # Get first IP if multiple
         
-        if not ai_rate_limiter.is_allowed(client_ip):
-            return jsonify({
+        allowed, retry_after = ai_rate_limiter.hit(f"{f.__name__}:{client_ip}", requests_per_minute)
+        if not allowed:
+            response = jsonify({
                 'error': 'Rate limit exceeded. Please wait a moment.',
-                'retryAfter': 60
-            }), 429
+                'retryAfter': retry_after
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
         
         return f(*args, **kwargs)
     return decorated_function
 
+# ============================================
+# QUESTION SERIALIZATION CACHE
+# ============================================
+# Precompiled patterns for "Your responses:" junk from Telegram exports
+RESPONSES_SUFFIX_RE = re.compile(r'\s*Your responses?:?\s*$', re.IGNORECASE)
+RESPONSES_MARKER_RE = re.compile(r'Your responses?:?\s*', re.IGNORECASE)
+
+def clean_option(opt):
+    """Remove "Your responses:" leftovers from an option"""
+    cleaned = RESPONSES_SUFFIX_RE.sub('', opt)
+    cleaned = RESPONSES_MARKER_RE.sub('', cleaned)
+    return cleaned.strip()
+
+class QuestionCache:
+    """
+    Versioned in-process cache of prepared question payloads keyed by
+    (question id, lang). Entries computed under an older version are
+    dropped, so a reader racing with invalidate() can't store stale data.
+    """
+    def __init__(self, max_size=5000):
+        self.max_size = max_size
+        self.version = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, question_id, lang):
+        key = (question_id, lang)
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+    
+    def set(self, question_id, lang, data, version):
+        with self.lock:
+            if version != self.version:
+                return
+            self.entries[(question_id, lang)] = data
+            self.entries.move_to_end((question_id, lang))
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+
+question_cache = QuestionCache()
+
+class QuestionSampler:
+    """
+    Dense in-memory arrays of question ids (all, and AI-cached) so a random
+    pick is random.choice instead of ORDER BY random() over the whole table.
+    Reloaded every `ttl` seconds, and right away in the worker that uploads.
+    """
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.ids = []
+        self.cached_ids = []
+        self.loaded_at = None
+        self.lock = threading.Lock()
+    
+    def refresh(self):
+        ids = [qid for (qid,) in db.session.query(Question.id)]
+        cached_ids = [qid for (qid,) in db.session.query(AICache.question_id).join(
+            Question, Question.id == AICache.question_id
+        )]
+        # Swap references; readers never see a half-built list
+        self.ids, self.cached_ids = ids, cached_ids
+        self.loaded_at = time.monotonic()
+    
+    def refresh_if_stale(self):
+        if self.loaded_at is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return
+        # One thread reloads, others keep using the previous arrays
+        if self.lock.acquire(blocking=self.loaded_at is None):
+            try:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl:
+                    self.refresh()
+            finally:
+                self.lock.release()
+    
+    def invalidate(self):
+        self.loaded_at = None
+    
+    def add_cached(self, question_id):
+        self.cached_ids.append(question_id)
+    
+    def pick(self, exclude=(), cached_only=False, attempts=8):
+        """Random id not in `exclude`; rejection sampling, O(1) expected"""
+        pool = self.cached_ids if cached_only else self.ids
+        if not pool:
+            return None
+        for _ in range(attempts):
+            question_id = random.choice(pool)
+            if question_id not in exclude:
+                return question_id
+        # Nearly everything excluded - fall back to a scan
+        remaining = [qid for qid in pool if qid not in exclude]
+        return random.choice(remaining) if remaining else random.choice(pool)
+
+question_sampler = QuestionSampler()
+
 # ============================================
 # MODELS
 # ============================================
@@ -358,49 +1125,131 @@ class AllowedIP(db.Model):
             'lastAccess': self.last_access.isoformat() if self.last_access else None
         }
 
+# Shared rate limit counters (UNLOGGED: no WAL, contents are disposable)
+class RateLimitCounter(db.Model):
+    __tablename__ = 'rate_limit_counters'
+    __table_args__ = {'prefixes': ['UNLOGGED']}
+    
+    key = db.Column(db.String(255), primary_key=True)
+    window_start = db.Column(db.BigInteger, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+# In-flight AI work claims (single-flight across workers)
+class AIClaim(db.Model):
+    __tablename__ = 'ai_claims'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    claimed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Background AI jobs (processed by `flask run-jobs`)
+class AIJob(db.Model):
+    __tablename__ = 'ai_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    job_type = db.Column(db.String(32), nullable=False)
+    question_id = db.Column(db.String(255), nullable=False)
+    lang = db.Column(db.String(10), nullable=False, default='en')
+    status = db.Column(db.String(16), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('question_id', 'job_type', 'lang', name='unique_job'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.job_type,
+            'questionId': self.question_id,
+            'lang': self.lang,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'updatedAt': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Question(db.Model):
     __tablename__ = 'questions'
     
     id = db.Column(db.String(255), primary_key=True)
+    # Normalized content hash (stem + sorted options), see question_fingerprint
+    fingerprint = db.Column(db.String(64), nullable=True, unique=True)
     number = db.Column(db.Integer, nullable=False)
     question = db.Column(db.Text, nullable=False)
     options = db.Column(ARRAY(db.Text), nullable=False)
     is_multiple_choice = db.Column(db.Boolean, default=False)
     select_count = db.Column(db.Integer, default=1)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Full-text index over stem, options and translations; maintained by
+    # DB triggers (see ensure_search_index), never loaded by default
+    search_vector = deferred(db.Column(TSVECTOR, nullable=True))
     
-    def to_dict(self, lang='en'):
-        # Очищаем опции от мусора типа "Your responses:"
-        def clean_option(opt):
-            import re
-            cleaned = re.sub(r'\s*Your responses?:?\s*$', '', opt, flags=re.IGNORECASE)
-            cleaned = re.sub(r'Your responses?:?\s*', '', cleaned, flags=re.IGNORECASE)
-            return cleaned.strip()
-        
-        cleaned_options = [clean_option(opt) for opt in self.options]
-        
-        data = {
-            'id': self.id,
-            'number': self.number,
-            'question': self.question,
-            'options': cleaned_options,
-            'isMultipleChoice': self.is_multiple_choice,
-            'selectCount': self.select_count,
-            'aiVerified': None,
-            'hasTranslation': False
-        }
+    __table_args__ = (
+        db.Index('questions_search_idx', 'search_vector', postgresql_using='gin'),
+    )
+    
+    def prepared(self, lang='en', translations=None):
+        """
+        Static part of the serialized question (cleaned options, translation).
+        Questions are keyed by content hash and translations are write-once,
+        so the result is cached per (id, lang) and only rebuilt on upload.
+        """
+        version = question_cache.version
+        data = question_cache.get(self.id, lang)
+        if data is not None:
+            return data
         
         if lang != 'en':
-            translation = Translation.query.filter_by(
-                question_id=self.id, 
-                language=lang
-            ).first()
-            if translation:
-                data['question'] = translation.question_text
-                data['options'] = [clean_option(opt) for opt in translation.options]
-                data['hasTranslation'] = True
+            if translations is not None:
+                translation = translations.get(self.id)
+            else:
+                translation = Translation.query.filter_by(
+                    question_id=self.id, 
+                    language=lang
+                ).first()
+            if not translation:
+                # Not translated yet - don't cache, translation may appear later
+                return self.prepared('en')
+            
+            data = {
+                'id': self.id,
+                'number': self.number,
+                'question': translation.question_text,
+                'options': [clean_option(opt) for opt in translation.options],
+                'isMultipleChoice': self.is_multiple_choice,
+                'selectCount': self.select_count,
+                'hasTranslation': True
+            }
+        else:
+            data = {
+                'id': self.id,
+                'number': self.number,
+                'question': self.question,
+                'options': [clean_option(opt) for opt in self.options],
+                'isMultipleChoice': self.is_multiple_choice,
+                'selectCount': self.select_count,
+                'hasTranslation': False
+            }
         
-        cache = db.session.get(AICache, self.id)
+        question_cache.set(self.id, lang, data, version)
+        return data
+    
+    def to_dict(self, lang='en', translations=None, caches=None):
+        """
+        Serialize question. `translations` and `caches` are optional maps
+        keyed by question id, preloaded by serialize_questions() so a page
+        of questions doesn't issue per-row queries.
+        """
+        data = dict(self.prepared(lang, translations))
+        data['aiVerified'] = None
+        
+        if caches is not None:
+            cache = caches.get(self.id)
+        else:
+            cache = db.session.get(AICache, self.id)
         if cache:
             data['aiVerified'] = cache.to_dict(lang)
         
@@ -443,68 +1292,181 @@ class Translation(db.Model):
 # ============================================
 # OPENAI HELPERS WITH RETRY LOGIC
 # ============================================
-def call_openai(messages, temperature=0.3, max_retries=3):
-    """Call OpenAI API with retry logic"""
+def create_openai_session():
+    """Shared keep-alive session so calls reuse pooled TCP/TLS connections"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Content-Type': 'application/json'})
+    return session
+
+openai_session = create_openai_session()
+
+def backoff_delay(attempt, base=1.0, cap=8.0):
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def call_openai(messages, temperature=0.3, max_retries=3, response_format=None):
+    """
+    Call OpenAI API with retry logic. Sleeps between retries are capped by
+    OPENAI_RETRY_BUDGET so a struggling API fails fast instead of pinning
+    a worker thread.
+    """
     if not OPENAI_API_KEY:
         raise Exception('OpenAI API key not configured')
     
     last_error = None
+    sleep_budget = OPENAI_RETRY_BUDGET
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {OPENAI_API_KEY}'
-                },
+            response = openai_session.post(
+                f'{OPENAI_BASE_URL}/chat/completions',
+                headers={'Authorization': f'Bearer {OPENAI_API_KEY}'},
                 json={
-                    'model': 'gpt-4o-mini',
+                    'model': OPENAI_MODEL,
                     'messages': messages,
-                    'temperature': temperature
+                    'temperature': temperature,
+                    **({'response_format': response_format} if response_format else {})
                 },
-                timeout=30
+                timeout=(5, 30)
             )
             
             if response.ok:
                 return response.json()['choices'][0]['message']['content']
             
-            # If rate limited, wait and retry
-            if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', 5))
-                logger.warning(f"OpenAI rate limited, waiting {retry_after}s")
-                time.sleep(retry_after)
-                continue
-            
-            # Other errors
             last_error = Exception(f'OpenAI API error: {response.status_code} - {response.text}')
             
-        except requests.exceptions.Timeout:
-            last_error = Exception('OpenAI API timeout')
-            logger.warning(f"OpenAI timeout, attempt {attempt + 1}/{max_retries}")
-            time.sleep(2 ** attempt)  # Exponential backoff
+            # Client errors other than rate limiting won't succeed on retry
+            if response.status_code != 429 and response.status_code < 500:
+                raise last_error
             
-        except Exception as e:
-            last_error = e
-            logger.error(f"OpenAI error: {e}")
-            time.sleep(1)
+            # Rate limited or server error - honour Retry-After if given
+            try:
+                delay = float(response.headers['Retry-After'])
+            except (KeyError, ValueError):
+                delay = backoff_delay(attempt)
+            logger.warning(f"OpenAI returned {response.status_code}, attempt {attempt + 1}/{max_retries}")
+            
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            last_error = Exception(f'OpenAI API connection error: {e}')
+            logger.warning(f"OpenAI timeout/connection error, attempt {attempt + 1}/{max_retries}")
+            delay = backoff_delay(attempt)
+        
+        if attempt + 1 >= max_retries:
+            break
+        if delay > sleep_budget:
+            logger.warning(f"OpenAI retry would wait {delay:.1f}s, over budget - giving up")
+            break
+        sleep_budget -= delay
+        time.sleep(delay)
     
     raise last_error
 
-def translate_text(text, text_type='question'):
-    """Translate text to Russian"""
+def build_translate_messages(text, text_type='question'):
+    """Chat messages for translating text to Russian"""
     if text_type == 'explanation':
         system_prompt = 'You are a translator. Translate the following AWS technical explanation to Russian. Keep technical terms in English where appropriate. Respond with ONLY the translation.'
     else:
         system_prompt = 'You are a translator. Translate the following AWS exam question/options to Russian. Keep AWS service names in English. Respond with ONLY the translation.'
     
-    return call_openai([
+    return [
         {'role': 'system', 'content': system_prompt},
         {'role': 'user', 'content': text}
-    ])
+    ]
 
-def get_ai_answer(question_text, options, is_multiple, select_count):
-    """Get AI answer for question"""
+def translate_text(text, text_type='question'):
+    """Translate text to Russian"""
+    return call_openai(build_translate_messages(text, text_type))
+
+# Bounded pool for fallback per-option translation
+translation_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix='translate')
+
+def split_option(opt):
+    """Split "A) text" into ("A", "text"), stripping "Your responses:" leftovers"""
+    # Format is usually "A) text" or "A). text"
+    if len(opt) > 3 and opt[1:3] in [') ', '). ']:
+        letter = opt[0]
+        text = opt[2:].strip() if opt[1] == ')' else opt[3:].strip()
+    else:
+        # Fallback - just translate as is
+        logger.warning(f"Unusual option format: {opt[:20]}...")
+        letter = opt[0] if len(opt) > 0 else 'A'
+        text = opt[3:] if len(opt) > 3 else opt
+    
+    text = text.replace('Your responses:', '').replace('Your response:', '').strip()
+    return letter, text
+
+def build_bundle_messages(question_text, parts):
+    """Chat messages translating stem and options (from split_option) as one JSON object"""
+    system_prompt = (
+        'You are a translator. Translate the AWS exam question and options in the given JSON to Russian. '
+        'Keep AWS service names in English. Respond with ONLY JSON of the same shape: '
+        '{"question": "...", "options": ["...", ...]} with options in the same order.'
+    )
+    return [
+        {'role': 'system', 'content': system_prompt},
+        {'role': 'user', 'content': json.dumps({
+            'question': question_text,
+            'options': [text for _, text in parts]
+        }, ensure_ascii=False)}
+    ]
+
+def parse_bundle_response(response, parts):
+    """Parse a bundle translation reply; returns (question, options) or None if malformed"""
+    try:
+        result = json.loads(response)
+    except ValueError:
+        return None
+    if not isinstance(result, dict):
+        return None
+    translated = result.get('options')
+    if not result.get('question') or not isinstance(translated, list) or len(translated) != len(parts):
+        return None
+    return result['question'], [
+        f"{letter}) {str(text).strip()}" for (letter, _), text in zip(parts, translated)
+    ]
+
+def translate_question_bundle(question_text, options):
+    """
+    Translate question and options to Russian with a single structured-JSON
+    call. Falls back to translating each item concurrently if the response
+    doesn't match the expected shape.
+    Returns (translated_question, translated_options).
+    """
+    parts = [split_option(opt) for opt in options]
+    
+    try:
+        response = call_openai(
+            build_bundle_messages(question_text, parts),
+            response_format={'type': 'json_object'}
+        )
+        result = parse_bundle_response(response, parts)
+        if result:
+            return result
+        logger.warning("Batched translation returned unexpected shape, falling back")
+    except Exception as e:
+        logger.warning(f"Batched translation failed, falling back: {e}")
+    
+    # Fallback: stem and options in parallel - latency is the slowest call, not the sum
+    question_future = translation_executor.submit(translate_text, question_text, 'question')
+    option_futures = [translation_executor.submit(translate_text, text, 'question') for _, text in parts]
+    
+    translated_question = question_future.result()
+    translated_options = []
+    for opt, (letter, _), future in zip(options, parts, option_futures):
+        try:
+            translated_options.append(f"{letter}) {future.result()}")
+        except Exception as e:
+            logger.error(f"Error translating option '{opt[:50]}...': {e}")
+            # Use original if translation fails
+            translated_options.append(opt)
+    
+    return translated_question, translated_options
+
+def build_ai_answer_messages(question_text, options, is_multiple, select_count):
+    """Chat messages asking the model for the correct answers and an explanation"""
     if is_multiple:
         system_prompt = f'''You are an AWS Cloud Practitioner expert. Analyze the question and provide EXACTLY {select_count} correct answers.
 
@@ -532,12 +1494,13 @@ Respond in JSON format: {"correctAnswers": ["A"], "explanation": "conceptual exp
     else:
         user_content += "Select ONE answer. Explain the reasoning without directly stating which option is correct."
     
-    response = call_openai([
+    return [
         {'role': 'system', 'content': system_prompt},
         {'role': 'user', 'content': user_content}
-    ])
-    
-    import json
+    ]
+
+def parse_ai_answer(response):
+    """Parse the model's JSON answer, with a regex fallback for sloppy output"""
     try:
         return json.loads(response)
     except:
@@ -549,88 +1512,1164 @@ Respond in JSON format: {"correctAnswers": ["A"], "explanation": "conceptual exp
             'correctAnswers': [a.strip().strip('"\'') for a in correct_match.group(1).split(',')] if correct_match else [],
             'explanation': explanation_match.group(1) if explanation_match else response
         }
-
-# ============================================
-# HELPER FUNCTIONS
-# ============================================
-def generate_question_id(number, question_text):
-    content = f"{number}_{question_text[:100]}"
-    return hashlib.md5(content.encode()).hexdigest()
-
-def parse_telegram_json(data):
-    messages = data.get('messages', [])
-    parsed_questions = []
+
+def get_ai_answer(question_text, options, is_multiple, select_count):
+    """Get AI answer for question"""
+    response = call_openai(build_ai_answer_messages(question_text, options, is_multiple, select_count))
+    return parse_ai_answer(response)
+
+# ============================================
+# RESPONSE COMPRESSION (/api/*)
+# ============================================
+API_COMPRESSION = os.getenv('API_COMPRESSION', '1') == '1'
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024'))  # bytes
+API_COMPRESSION_LEVEL = int(os.getenv('API_COMPRESSION_LEVEL', '6'))  # gzip 1-9
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', '5'))  # brotli 0-11
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/csv'}
+# Streamed bodies are flushed every N input bytes; progressive ones every chunk
+API_COMPRESSION_STREAM_BUFFER = int(os.getenv('API_COMPRESSION_STREAM_BUFFER', '16384'))
+PROGRESSIVE_MIMETYPES = {'application/x-ndjson'}
+
+def no_compression(f):
+    """Route opt-out: serve this endpoint's responses uncompressed"""
+    f.no_compression = True
+    return f
+
+class StreamCompressor:
+    """Incremental gzip/brotli encoder with the same process/flush/finish interface"""
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=API_BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(API_COMPRESSION_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+    
+    def process(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data)
+        return self.compressor.compress(data)
+    
+    def flush(self):
+        if self.encoding == 'br':
+            return self.compressor.flush()
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+    
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush(zlib.Z_FINISH)
+
+def compress_stream(chunks, encoding, flush_bytes=API_COMPRESSION_STREAM_BUFFER):
+    """
+    Compress a streamed body incrementally. Output is flushed once
+    `flush_bytes` of input have accumulated (0 = after every chunk, so
+    progressive responses like NDJSON progress arrive as produced).
+    """
+    compressor = StreamCompressor(encoding)
+    pending = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk)
+            pending += len(chunk)
+            if pending >= flush_bytes:
+                data += compressor.flush()
+                pending = 0
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def pick_api_encoding():
+    """Best encoding the client accepts: br (when installed), then gzip"""
+    if brotli and request.accept_encodings.quality('br') > 0:
+        return 'br'
+    if request.accept_encodings.quality('gzip') > 0:
+        return 'gzip'
+    return None
+
+@app.after_request
+def compress_api_response(response):
+    """Compress JSON API responses over the size threshold (streamed ones always)"""
+    if not API_COMPRESSION or not request.path.startswith('/api/'):
+        return response
+    view = app.view_functions.get(request.endpoint)
+    if getattr(view, 'no_compression', False):
+        return response
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = pick_api_encoding()
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        flush_bytes = 0 if response.mimetype in PROGRESSIVE_MIMETYPES else API_COMPRESSION_STREAM_BUFFER
+        response.response = compress_stream(response.response, encoding, flush_bytes)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < API_COMPRESSION_MIN_SIZE:
+            return response
+        compressor = StreamCompressor(encoding)
+        response.set_data(compressor.process(data) + compressor.finish())
+    
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the identity body, so a strong validator
+    # becomes weak (If-None-Match is compared weakly, 304s keep working)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# ============================================
+# HELPER FUNCTIONS
+# ============================================
+def make_etag(*parts):
+    """Strong validator from version parts (row versions, file hashes, params)"""
+    return hashlib.sha256('|'.join(str(p) for p in parts).encode()).hexdigest()[:32]
+
+def conditional_json(build, etag, weak=False, max_age=0, last_modified=None):
+    """
+    JSON response with ETag / Last-Modified / Cache-Control. Answers a
+    matching If-None-Match with 304 without calling `build`.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        body = build()
+        # `build` may return a ready (e.g. streamed) response
+        response = body if isinstance(body, Response) else jsonify(body)
+    
+    response.set_etag(etag, weak=weak)
+    if last_modified:
+        response.last_modified = last_modified
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        # Always revalidate - cheap thanks to the ETag
+        response.cache_control.no_cache = True
+    # With the IP whitelist on, shared caches must not serve responses to other clients
+    if ip_allowlist.enforced:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    return response
+
+def normalize_fingerprint_text(value):
+    """Lowercase, "Your responses:" removed, whitespace collapsed (ingest hot path)"""
+    value = value.lower()
+    if 'your respons' in value:  # rare leftovers - only then pay for the regexes
+        value = clean_option(value)
+    return ' '.join(value.split())
+
+def normalize_question_text(question_text, options):
+    """Canonical form of a question: normalized stem plus sorted option texts"""
+    option_texts = []
+    for opt in options:
+        # Drop an "A)" / "A)." letter prefix
+        if len(opt) > 1 and opt[1] == ')' and 'A' <= opt[0] <= 'Z':
+            opt = opt[3:] if opt[2:3] == '.' else opt[2:]
+        option_texts.append(normalize_fingerprint_text(opt))
+    option_texts.sort()
+    return normalize_fingerprint_text(question_text), option_texts
+
+def question_fingerprint(question_text, options):
+    """
+    Content fingerprint: the same question reposted with another number or
+    shuffled options gets the same value. Used as id for new questions.
+    """
+    stem, option_texts = normalize_question_text(question_text, options)
+    content = stem + '\x1f' + '\x1e'.join(option_texts)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class MinHashLSH:
+    """
+    MinHash signatures over word 3-shingles with banded LSH, for spotting
+    near-duplicate questions (rewording, typos) that fingerprints miss.
+    """
+    PRIME = (1 << 61) - 1
+    
+    def __init__(self, num_perm=64, bands=16, threshold=0.7):
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        rng = random.Random(1)
+        self.perms = [(rng.randrange(1, self.PRIME), rng.randrange(0, self.PRIME)) for _ in range(num_perm)]
+        self.buckets = {}
+        self.signatures = {}
+    
+    def signature(self, question_text, options):
+        stem, option_texts = normalize_question_text(question_text, options)
+        tokens = ' '.join([stem] + option_texts).split()
+        shingles = {' '.join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))}
+        hashes = [zlib.crc32(sh.encode()) for sh in shingles]
+        prime = self.PRIME
+        return tuple(min((a * h + b) % prime for h in hashes) for a, b in self.perms)
+    
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+    
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for band_key in self.band_keys(signature):
+            self.buckets.setdefault(band_key, []).append(key)
+    
+    def query(self, signature):
+        """Keys whose estimated Jaccard similarity is above the threshold, best first"""
+        candidates = set()
+        for band_key in self.band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        
+        matches = []
+        for key in candidates:
+            other = self.signatures[key]
+            score = sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+            if score >= self.threshold:
+                matches.append((key, score))
+        return sorted(matches, key=lambda m: -m[1])
+
+def build_near_duplicate_index(threshold=0.7):
+    """MinHash index over the whole question bank, plus the set of its fingerprints"""
+    index = MinHashLSH(threshold=threshold)
+    fingerprints = set()
+    for question_id, fingerprint, question_text, options in db.session.query(
+        Question.id, Question.fingerprint, Question.question, Question.options
+    ).yield_per(1000):
+        index.add(question_id, index.signature(question_text, options))
+        fingerprints.add(fingerprint)
+    return index, fingerprints
+
+class NearDuplicateIndexCache:
+    """
+    Per-worker bank index for upload checks, rebuilt only when the bank
+    changes (row count or newest created_at). Treated as read-only.
+    """
+    def __init__(self):
+        self.key = None
+        self.value = None
+        self.lock = threading.Lock()
+    
+    def get(self):
+        key = tuple(db.session.query(func.count(Question.id), func.max(Question.created_at)).one())
+        with self.lock:
+            if self.value is None or self.key != key:
+                self.value = build_near_duplicate_index()
+                self.key = key
+            return self.value
+
+near_duplicate_indexes = NearDuplicateIndexCache()
+
+SEARCH_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+def build_search_query(search):
+    """
+    Prefix tsquery (as-you-type) matching English and Russian text,
+    or None if the search has no word characters.
+    """
+    terms = SEARCH_TERM_RE.findall(search.lower())[:10]
+    if not terms:
+        return None
+    expression = ' & '.join(f'{term}:*' for term in terms)
+    return func.to_tsquery('english', expression).op('||')(func.to_tsquery('russian', expression))
+
+def add_search_snippets(questions, ts_query):
+    """Attach ts_headline highlights for the rows on the current page"""
+    if ts_query is None or not questions:
+        return
+    snippets = dict(db.session.query(
+        Question.id,
+        func.ts_headline(
+            'english', Question.question, ts_query,
+            'StartSel=<mark>, StopSel=</mark>, MaxWords=30, MinWords=10'
+        )
+    ).filter(Question.id.in_([q['id'] for q in questions])).all())
+    for q in questions:
+        q['searchSnippet'] = snippets.get(q['id'])
+
+def encode_cursor(number, question_id, direction):
+    """Opaque pagination cursor for keyset mode"""
+    raw = json.dumps([number, question_id, direction], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(number, id, direction) from encode_cursor, None for an empty cursor; ValueError if malformed"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        number, question_id, direction = json.loads(raw)
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(number, int) or not isinstance(question_id, str) or direction not in ('next', 'prev'):
+        raise ValueError('Invalid cursor')
+    return number, question_id, direction
+
+class TotalCache:
+    """Short-lived per-worker cache of COUNT(*) results keyed by search string"""
+    def __init__(self, ttl=30, max_size=500):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                return entry[0]
+        value = compute()
+        with self.lock:
+            self.entries[key] = (value, now + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+    
+    def invalidate(self):
+        with self.lock:
+            self.entries.clear()
+
+question_totals = TotalCache()
+
+def estimate_question_count():
+    """Planner row estimate for questions - no table scan"""
+    estimate = db.session.execute(text(
+        "SELECT reltuples::bigint FROM pg_class WHERE oid = 'questions'::regclass"
+    )).scalar()
+    # -1 / 0 until the table has been analyzed
+    if not estimate or estimate < 0:
+        return question_totals.get('', lambda: Question.query.count())
+    return estimate
+
+def column_exists(table, column):
+    return db.session.execute(text(
+        'SELECT 1 FROM information_schema.columns '
+        'WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column'
+    ), {'table': table, 'column': column}).first() is not None
+
+def trigger_exists(table, name):
+    return db.session.execute(text(
+        'SELECT 1 FROM pg_trigger WHERE tgrelid = to_regclass(:table) AND tgname = :name'
+    ), {'table': table, 'name': name}).first() is not None
+
+def index_exists(name):
+    return db.session.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}).scalar()
+
+def ensure_search_index(force=False):
+    """
+    Create the tsvector column, its maintenance triggers and GIN index on
+    databases created before full-text search existed, and backfill rows.
+    At startup this only reads the catalogs when everything is in place:
+    ALTER/DROP TRIGGER take ACCESS EXCLUSIVE locks even when they change
+    nothing. `flask migrate-db` passes force=True to reapply the DDL.
+    """
+    if not force and (
+        column_exists('questions', 'search_vector')
+        and trigger_exists('questions', 'questions_search_update')
+        and trigger_exists('translations', 'translations_search_update')
+        and index_exists('questions_search_idx')
+    ):
+        db.session.commit()
+        return
+    
+    db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('questions_search'))"))
+    db.session.execute(text('ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector tsvector'))
+    db.session.execute(text('''
+        CREATE OR REPLACE FUNCTION question_search_vector(q_id text, q_text text, q_options text[])
+        RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('english', coalesce(q_text, '')), 'A')
+                || setweight(to_tsvector('english', coalesce(array_to_string(q_options, ' '), '')), 'B')
+                || coalesce((
+                    SELECT setweight(to_tsvector('russian', string_agg(
+                        t.question_text || ' ' || array_to_string(t.options, ' '), ' '
+                    )), 'C')
+                    FROM translations t WHERE t.question_id = q_id
+                ), ''::tsvector)
+        $$ LANGUAGE sql STABLE
+    '''))
+    db.session.execute(text('''
+        CREATE OR REPLACE FUNCTION questions_search_trigger() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := question_search_vector(NEW.id, NEW.question, NEW.options);
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql
+    '''))
+    db.session.execute(text('''
+        CREATE OR REPLACE FUNCTION translations_search_trigger() RETURNS trigger AS $$
+        BEGIN
+            UPDATE questions SET search_vector = question_search_vector(id, question, options)
+            WHERE id = NEW.question_id;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    '''))
+    db.session.execute(text('DROP TRIGGER IF EXISTS questions_search_update ON questions'))
+    db.session.execute(text('''
+        CREATE TRIGGER questions_search_update
+        BEFORE INSERT OR UPDATE OF question, options ON questions
+        FOR EACH ROW EXECUTE FUNCTION questions_search_trigger()
+    '''))
+    db.session.execute(text('DROP TRIGGER IF EXISTS translations_search_update ON translations'))
+    db.session.execute(text('''
+        CREATE TRIGGER translations_search_update
+        AFTER INSERT OR UPDATE ON translations
+        FOR EACH ROW EXECUTE FUNCTION translations_search_trigger()
+    '''))
+    db.session.execute(text(
+        'CREATE INDEX IF NOT EXISTS questions_search_idx ON questions USING GIN (search_vector)'
+    ))
+    result = db.session.execute(text('''
+        UPDATE questions SET search_vector = question_search_vector(id, question, options)
+        WHERE search_vector IS NULL
+    '''))
+    if result.rowcount:
+        logger.info(f"Backfilled search index for {result.rowcount} questions")
+    db.session.commit()
+
+def ensure_question_fingerprints(force=False):
+    """
+    Add and backfill questions.fingerprint on databases created before it
+    existed. Rows whose content duplicates an earlier row keep NULL.
+    Skipped (catalog reads only) when the column and index exist, unless forced.
+    """
+    if not force and column_exists('questions', 'fingerprint') and index_exists('questions_fingerprint_key'):
+        db.session.commit()
+        return
+    
+    # Only one worker migrates; others wait and then find nothing to do
+    db.session.execute(text("SELECT pg_advisory_xact_lock(hashtext('questions_fingerprint'))"))
+    db.session.execute(text('ALTER TABLE questions ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64)'))
+    db.session.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS questions_fingerprint_key ON questions (fingerprint)'
+    ))
+    
+    missing = db.session.query(Question.id, Question.question, Question.options).filter(
+        Question.fingerprint.is_(None)
+    ).order_by(Question.created_at).all()
+    
+    if missing:
+        seen = {fp for (fp,) in db.session.query(Question.fingerprint).filter(Question.fingerprint.isnot(None))}
+        updates = []
+        duplicates = 0
+        for question_id, question_text, options in missing:
+            fingerprint = question_fingerprint(question_text, options)
+            if fingerprint in seen:
+                duplicates += 1
+                continue
+            seen.add(fingerprint)
+            updates.append({'id': question_id, 'fingerprint': fingerprint})
+        if updates:
+            db.session.execute(update(Question), updates)
+        logger.info(f"Backfilled {len(updates)} question fingerprints ({duplicates} content duplicates)")
+    
+    db.session.commit()
+
+def serialize_questions(questions, lang='en'):
+    """
+    Serialize a list of questions with batched loading:
+    one query for translations and one for AI cache, regardless of list size.
+    """
+    question_ids = [q.id for q in questions]
+    if not question_ids:
+        return []
+    
+    translations = {}
+    if lang != 'en':
+        translations = {
+            t.question_id: t
+            for t in Translation.query.filter(
+                Translation.question_id.in_(question_ids),
+                Translation.language == lang
+            )
+        }
+    
+    caches = {
+        c.question_id: c
+        for c in AICache.query.filter(AICache.question_id.in_(question_ids))
+    }
+    
+    return [q.to_dict(lang, translations=translations, caches=caches) for q in questions]
+
+def bulk_insert_questions(parsed_questions, chunk_size=1000):
+    """
+    Insert parsed questions with chunked INSERT ... ON CONFLICT DO NOTHING
+    RETURNING id - no per-row lookups. Doesn't commit.
+    Returns (new_count, duplicate_count).
+    """
+    # Same question twice in one export counts as a duplicate.
+    # Conflicts on either id or fingerprint are skipped.
+    unique = {q['fingerprint']: q for q in parsed_questions}
+    rows = list(unique.values())
+    now = datetime.utcnow()
+    
+    new_count = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        result = db.session.execute(
+            pg_insert(Question).values([{
+                'id': q['id'],
+                'fingerprint': q['fingerprint'],
+                'number': q['number'],
+                'question': q['question'],
+                'options': q['options'],
+                'is_multiple_choice': q['is_multiple_choice'],
+                'select_count': q['select_count'],
+                'created_at': now
+            } for q in chunk]).on_conflict_do_nothing().returning(Question.id)
+        )
+        new_count += len(result.fetchall())
+    
+    return new_count, len(parsed_questions) - new_count
+
+# Precompiled Telegram export patterns
+QUESTION_RE = re.compile(r'Question #(\d+)\n\n(.+?)\n\n([A-Z]\).+)', re.DOTALL)
+SELECT_COUNT_RE = re.compile(r'\(Select (\d+)\)')
+OPTION_SPLIT_RE = re.compile(r'\n(?=[A-Z]\))')
+
+def parse_telegram_message(msg):
+    """Parse one Telegram export message into a question dict, or None"""
+    text_content = msg.get('text')
+    if not text_content:
+        return None
+    
+    if isinstance(text_content, list):
+        text_content = ''.join(
+            item if isinstance(item, str) else item.get('text', '')
+            for item in text_content
+        )
+    
+    question_match = QUESTION_RE.search(text_content)
+    if not question_match:
+        return None
+    
+    number, question_text, options_text = question_match.groups()
+    
+    # One search gives both the multi-select flag and the count
+    select_count_match = SELECT_COUNT_RE.search(question_text)
+    
+    # Options block is "A) ...\nB) ..." - split before each letter marker
+    options = []
+    for piece in OPTION_SPLIT_RE.split(options_text):
+        option_text = piece[2:].strip()
+        if option_text:
+            options.append(piece[:2] + ' ' + option_text)
+    
+    if not options:
+        return None
+    
+    clean_question = question_text.strip()
+    fingerprint = question_fingerprint(clean_question, options)
+    return {
+        'id': fingerprint,
+        'fingerprint': fingerprint,
+        'number': int(number),
+        'question': clean_question,
+        'options': options,
+        'is_multiple_choice': select_count_match is not None,
+        'select_count': int(select_count_match.group(1)) if select_count_match else 1
+    }
+
+def iter_parsed_questions(messages):
+    """Lazily parse an iterable of Telegram messages"""
+    for msg in messages:
+        parsed = parse_telegram_message(msg)
+        if parsed:
+            yield parsed
+
+def parse_telegram_json(data):
+    return list(iter_parsed_questions(data.get('messages', [])))
+
+def iter_parsed_questions_parallel(messages, processes=None, chunksize=500):
+    """Parse messages across a process pool (for very large offline imports)"""
+    with multiprocessing.Pool(processes) as pool:
+        for parsed in pool.imap(parse_telegram_message, messages, chunksize):
+            if parsed:
+                yield parsed
+
+class JSONStreamReader:
+    """
+    Minimal incremental JSON reader over a binary stream. Decodes one value
+    at a time with JSONDecoder.raw_decode and drops consumed text, so only
+    the value being decoded is held in memory.
+    """
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_read = 0
+    
+    def fill(self):
+        """Read another chunk; returns False at end of stream"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buffer += self.text_decoder.decode(b'', final=True)
+            return False
+        self.bytes_read += len(chunk)
+        # Drop consumed text before growing the buffer
+        self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(chunk)
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Next non-whitespace character (not consumed), or '' at end"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected {char!r} at byte ~{self.bytes_read}")
+        self.pos += 1
+    
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may be cut off
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_telegram_messages(reader):
+    """
+    Yield entries of the top-level "messages" array of a Telegram export
+    from a JSONStreamReader, one at a time. Other top-level keys are skipped.
+    """
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        
+        if key == 'messages':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.peek() == ',':
+                        reader.pos += 1
+                        continue
+                    reader.expect(']')
+                    break
+        else:
+            reader.value()
+        
+        if reader.peek() == ',':
+            reader.pos += 1
+            continue
+        reader.expect('}')
+        return
+
+def chunked(iterable, size):
+    """Split an iterable into lists of at most `size` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# ============================================
+# AI WORK (shared by API routes and job worker)
+# ============================================
+def generate_ai_cache(question_id, lang='en'):
+    """
+    Make sure AICache has an answer for the question (and the Russian
+    explanation when lang='ru'). Raises LookupError for unknown questions.
+    """
+    cache = db.session.get(AICache, question_id)
+    
+    if not cache:
+        question = db.session.get(Question, question_id)
+        if not question:
+            raise LookupError(f'Question not found: {question_id}')
+        
+        logger.info(f"Processing AI request for question {question_id}")
+        
+        # Get AI answer
+        result = get_ai_answer(
+            question.question,
+            question.options,
+            question.is_multiple_choice,
+            question.select_count
+        )
+        
+        # Translate if needed
+        explanation_ru = None
+        if lang == 'ru':
+            try:
+                explanation_ru = translate_text(result['explanation'], 'explanation')
+            except Exception as e:
+                logger.error(f'Translation error: {e}')
+        
+        # Save to cache with proper error handling
+        try:
+            cache = AICache(
+                question_id=question_id,
+                correct_answers=result['correctAnswers'],
+                explanation=result['explanation'],
+                explanation_ru=explanation_ru
+            )
+            db.session.add(cache)
+            db.session.commit()
+            question_sampler.add_cached(question_id)
+            logger.info(f"Cached AI result for question {question_id}")
+        except IntegrityError:
+            # Another request already saved this - fetch it
+            db.session.rollback()
+            cache = db.session.get(AICache, question_id)
+            if not cache:
+                raise Exception("Failed to save or retrieve cache")
+        return cache
+    
+    if lang == 'ru' and not cache.explanation_ru:
+        # Re-check, another worker may have translated it meanwhile
+        db.session.refresh(cache)
+        if not cache.explanation_ru:
+            cache.explanation_ru = translate_text(cache.explanation, 'explanation')
+            db.session.commit()
+    
+    return cache
+
+def generate_translation(question_id, lang='ru'):
+    """
+    Make sure a Translation row exists for the question.
+    Raises LookupError for unknown questions.
+    """
+    if lang not in JOB_LANGS[JOB_TRANSLATION]:
+        # translate_question_bundle always produces Russian
+        raise ValueError(f'Unsupported translation language: {lang}')
+    
+    existing = Translation.query.filter_by(question_id=question_id, language=lang).first()
+    if existing:
+        return existing
+    
+    question = db.session.get(Question, question_id)
+    if not question:
+        raise LookupError(f'Question not found: {question_id}')
+    
+    logger.info(f"Translating question {question_id}")
+    
+    # Translate question and options together
+    translated_question, translated_options = translate_question_bundle(
+        question.question, question.options
+    )
+    
+    # Save translation
+    try:
+        translation = Translation(
+            question_id=question_id,
+            language=lang,
+            question_text=translated_question,
+            options=translated_options
+        )
+        db.session.add(translation)
+        db.session.commit()
+        logger.info(f"Translation saved for {question_id}")
+        return translation
+    except IntegrityError:
+        db.session.rollback()
+        logger.warning(f"Translation already exists (race condition): {question_id}")
+        existing = Translation.query.filter_by(question_id=question_id, language=lang).first()
+        if not existing:
+            raise Exception("Failed to save or retrieve translation")
+        return existing
+
+# ============================================
+# AI JOB QUEUE
+# ============================================
+# When enabled, AI endpoints enqueue work for `flask run-jobs` instead of
+# calling OpenAI inside the request
+AI_JOB_QUEUE = os.getenv('AI_JOB_QUEUE', '').lower() in ('1', 'true', 'on')
+
+JOB_AI_ANSWER = 'ai_answer'
+JOB_TRANSLATION = 'translation'
+JOB_TYPES = {JOB_AI_ANSWER, JOB_TRANSLATION}
+# Languages each job type can produce (translations are Russian-only);
+# the first one is the default
+JOB_LANGS = {JOB_AI_ANSWER: ('en', 'ru'), JOB_TRANSLATION: ('ru',)}
+
+JOB_MAX_ATTEMPTS = 3
+JOB_STALE_AFTER = 300  # seconds before a 'running' job is assumed abandoned
+JOB_RETRY_AFTER = 300  # seconds before a finished or failed job may be requeued
+# Errors retrying can't fix; such jobs end as 'rejected' and are never requeued
+JOB_PERMANENT_ERRORS = (LookupError, ValueError)
+
+def enqueue_job(job_type, question_id, lang=None):
+    """
+    Enqueue a job, deduplicated on (question_id, job_type, lang).
+    Done or failed jobs are reset to pending only after JOB_RETRY_AFTER,
+    rejected ones never. Raises ValueError for an unsupported type or
+    language and LookupError for unknown questions, so junk input never
+    creates rows. Returns the AIJob row.
+    """
+    if not isinstance(job_type, str) or job_type not in JOB_TYPES:
+        raise ValueError(f'Unknown job type: {job_type}')
+    lang = lang or JOB_LANGS[job_type][0]
+    if lang not in JOB_LANGS[job_type]:
+        raise ValueError(f'Unsupported language for {job_type}: {lang}')
+    if not isinstance(question_id, str):
+        raise ValueError('Question ID must be a string')
+    if not db.session.query(Question.query.filter_by(id=question_id).exists()).scalar():
+        raise LookupError(f'Question not found: {question_id}')
+    
+    now = datetime.utcnow()
+    db.session.execute(text('''
+        INSERT INTO ai_jobs (job_type, question_id, lang, status, attempts, created_at, updated_at)
+        VALUES (:job_type, :question_id, :lang, 'pending', 0, :now, :now)
+        ON CONFLICT (question_id, job_type, lang) DO UPDATE
+        SET status = 'pending', attempts = 0, error = NULL, updated_at = EXCLUDED.updated_at
+        WHERE ai_jobs.status IN ('failed', 'done') AND ai_jobs.updated_at < :retry_before
+    '''), {
+        'job_type': job_type, 'question_id': question_id, 'lang': lang, 'now': now,
+        'retry_before': now - timedelta(seconds=JOB_RETRY_AFTER)
+    })
+    db.session.commit()
+    return AIJob.query.filter_by(question_id=question_id, job_type=job_type, lang=lang).first()
+
+def queued_ai_response(job_type, question_id, lang=None):
+    """
+    Queue-mode reply for the AI routes: enqueue (validated) and answer 202
+    while the job is in flight. Returns None once the job is done, so the
+    caller serves whatever the job produced.
+    """
+    try:
+        job = enqueue_job(job_type, question_id, lang)
+    except LookupError:
+        return jsonify({'error': 'Question not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if job.status == 'done':
+        return None
+    if job.status in ('failed', 'rejected'):
+        return jsonify({'error': job.error or 'AI job failed', 'job': job.to_dict()}), 502
+    return ai_pending_response(question_id)
+
+def claim_next_job():
+    """Lock and mark the oldest runnable job as running (SKIP LOCKED, safe for many workers)"""
+    now = datetime.utcnow()
+    row = db.session.execute(text('''
+        UPDATE ai_jobs SET status = 'running', attempts = attempts + 1, updated_at = :now
+        WHERE id = (
+            SELECT id FROM ai_jobs
+            WHERE status = 'pending'
+               OR (status = 'running' AND updated_at < :stale_before)
+            ORDER BY created_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id
+    '''), {'now': now, 'stale_before': now - timedelta(seconds=JOB_STALE_AFTER)}).first()
+    db.session.commit()
+    return db.session.get(AIJob, row[0]) if row else None
+
+def run_job(job):
+    """Process one claimed job and record the outcome"""
+    try:
+        if job.job_type == JOB_AI_ANSWER:
+            generate_ai_cache(job.question_id, job.lang)
+        elif job.job_type == JOB_TRANSLATION:
+            generate_translation(job.question_id, job.lang)
+        else:
+            raise ValueError(f'Unknown job type: {job.job_type}')
+        job.status = 'done'
+        job.error = None
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Job {job.id} ({job.job_type} {job.question_id}) failed: {e}")
+        if isinstance(e, JOB_PERMANENT_ERRORS):
+            # Unknown question / unsupported language - retrying won't help
+            job.status = 'rejected'
+        else:
+            job.status = 'pending' if job.attempts < JOB_MAX_ATTEMPTS else 'failed'
+        job.error = str(e)[:1000]
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+# ============================================
+# BATCH ENRICHMENT (OpenAI Batch API)
+# ============================================
+BATCH_DONE_STATES = {'completed', 'failed', 'expired', 'cancelled'}
+
+def build_batch_requests(lang='en'):
+    """
+    Yield Batch API request lines for every question missing AI data.
+    custom_id is "<kind>:<question_id>" with kind answer/translation/explanation.
+    Russian explanations need an answer first, so a new question gets its
+    explanation on the next batch run.
+    """
+    def line(kind, question_id, messages, **extra):
+        return {
+            'custom_id': f'{kind}:{question_id}',
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {'model': OPENAI_MODEL, 'messages': messages, 'temperature': 0.3, **extra}
+        }
+    
+    rows = db.session.query(Question, AICache).outerjoin(
+        AICache, AICache.question_id == Question.id
+    ).order_by(Question.number).yield_per(500)
+    
+    translated_ids = set()
+    if lang == 'ru':
+        translated_ids = {
+            qid for (qid,) in db.session.query(Translation.question_id).filter_by(language=lang)
+        }
     
-    for msg in messages:
-        if not msg.get('text'):
-            continue
-            
-        text_content = msg['text']
-        if isinstance(text_content, list):
-            text_content = ''.join(
-                item if isinstance(item, str) else item.get('text', '')
-                for item in text_content
-            )
+    for question, cache in rows:
+        if cache is None:
+            yield line('answer', question.id, build_ai_answer_messages(
+                question.question, question.options,
+                question.is_multiple_choice, question.select_count
+            ))
+        elif lang == 'ru' and not cache.explanation_ru:
+            yield line('explanation', question.id, build_translate_messages(cache.explanation, 'explanation'))
         
-        import re
-        question_match = re.search(
-            r'Question #(\d+)\n\n(.+?)\n\n([A-Z]\).+)',
-            text_content,
-            re.DOTALL
+        if lang == 'ru' and question.id not in translated_ids:
+            parts = [split_option(opt) for opt in question.options]
+            yield line('translation', question.id, build_bundle_messages(question.question, parts),
+                       response_format={'type': 'json_object'})
+
+class OpenAIBatchTransport:
+    """Submits batch files to the OpenAI Files + Batches API"""
+    def __init__(self, session=None):
+        self.session = session or openai_session
+    
+    def _headers(self):
+        return {'Authorization': f'Bearer {OPENAI_API_KEY}'}
+    
+    def submit(self, path):
+        with open(path, 'rb') as f:
+            upload = self.session.post(
+                f'{OPENAI_BASE_URL}/files',
+                # Drop the session's JSON content type so requests builds multipart
+                headers={**self._headers(), 'Content-Type': None},
+                data={'purpose': 'batch'},
+                files={'file': (os.path.basename(path), f, 'application/jsonl')},
+                timeout=300
+            )
+        upload.raise_for_status()
+        batch = self.session.post(
+            f'{OPENAI_BASE_URL}/batches',
+            headers=self._headers(),
+            json={
+                'input_file_id': upload.json()['id'],
+                'endpoint': '/v1/chat/completions',
+                'completion_window': '24h'
+            },
+            timeout=30
         )
-        
-        if question_match:
-            question_number = int(question_match.group(1))
-            question_text = question_match.group(2)
-            options_text = question_match.group(3)
-            
-            is_multiple = bool(re.search(r'\(Select \d+\)', question_text))
-            select_count_match = re.search(r'\(Select (\d+)\)', question_text)
-            select_count = int(select_count_match.group(1)) if select_count_match else 1
-            
-            clean_question = question_text.strip()
+        batch.raise_for_status()
+        return batch.json()['id']
+    
+    def status(self, batch_id):
+        response = self.session.get(f'{OPENAI_BASE_URL}/batches/{batch_id}', headers=self._headers(), timeout=30)
+        response.raise_for_status()
+        return response.json()
+    
+    def results(self, batch_info):
+        output_file_id = batch_info.get('output_file_id')
+        if not output_file_id:
+            return
+        response = self.session.get(
+            f'{OPENAI_BASE_URL}/files/{output_file_id}/content',
+            headers=self._headers(),
+            stream=True,
+            timeout=300
+        )
+        response.raise_for_status()
+        for raw in response.iter_lines():
+            if raw:
+                yield json.loads(raw)
 
-            option_matches = re.findall(
-                r'([A-Z])\)\s*(.+?)(?=\n[A-Z]\)|$)',
-                options_text,
-                re.DOTALL
-            )
-            
-            options = [f"{letter}) {text.strip()}" for letter, text in option_matches]
+class LocalBatchTransport:
+    """
+    Stand-in for the Batch API: runs each request through call_openai (which
+    can point at a fake server via OPENAI_BASE_URL) and writes a result file
+    in the Batch API output format.
+    """
+    def submit(self, path):
+        output_path = f'{path}.results'
+        with open(path, 'r', encoding='utf-8') as src, open(output_path, 'w', encoding='utf-8') as out:
+            for raw in src:
+                req = json.loads(raw)
+                body = req['body']
+                result = {'custom_id': req['custom_id'], 'response': None, 'error': None}
+                try:
+                    content = call_openai(
+                        body['messages'],
+                        temperature=body.get('temperature', 0.3),
+                        response_format=body.get('response_format')
+                    )
+                    result['response'] = {
+                        'status_code': 200,
+                        'body': {'choices': [{'message': {'content': content}}]}
+                    }
+                except Exception as e:
+                    result['error'] = {'message': str(e)}
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+        return output_path
+    
+    def status(self, batch_id):
+        return {'id': batch_id, 'status': 'completed', 'output_file_id': batch_id}
+    
+    def results(self, batch_info):
+        with open(batch_info['output_file_id'], 'r', encoding='utf-8') as f:
+            for raw in f:
+                yield json.loads(raw)
+
+BATCH_TRANSPORTS = {
+    'openai': OpenAIBatchTransport,
+    'local': LocalBatchTransport,
+}
+
+def apply_batch_results(results, lang='en', chunk_size=500):
+    """Bulk-upsert AICache / Translation rows from Batch API result lines"""
+    counts = {'answer': 0, 'translation': 0, 'explanation': 0, 'failed': 0}
+    answers, translations, explanations = [], [], []
+    
+    def flush():
+        if answers:
+            db.session.execute(pg_insert(AICache).values(answers).on_conflict_do_nothing(
+                index_elements=['question_id']
+            ))
+        if translations:
+            db.session.execute(pg_insert(Translation).values(translations).on_conflict_do_nothing(
+                constraint='unique_question_language'
+            ))
+        if explanations:
+            db.session.execute(update(AICache), explanations)
+        db.session.commit()
+        answers.clear()
+        translations.clear()
+        explanations.clear()
+    
+    for chunk in chunked(results, chunk_size):
+        # Options for this chunk's translation results, in one IN query
+        translation_ids = [
+            item.get('custom_id', '').partition(':')[2]
+            for item in chunk if item.get('custom_id', '').startswith('translation:')
+        ]
+        options_by_id = dict(db.session.query(Question.id, Question.options).filter(
+            Question.id.in_(translation_ids)
+        )) if translation_ids else {}
+        
+        for item in chunk:
+            kind, _, question_id = item.get('custom_id', '').partition(':')
+            response = item.get('response') or {}
+            if item.get('error') or response.get('status_code') != 200:
+                counts['failed'] += 1
+                logger.warning(f"Batch item {item.get('custom_id')} failed: {item.get('error')}")
+                continue
+            content = response['body']['choices'][0]['message']['content']
+            now = datetime.utcnow()
             
-            if options:
-                question_id = generate_question_id(question_number, clean_question)
-                parsed_questions.append({
-                    'id': question_id,
-                    'number': question_number,
-                    'question': clean_question,
-                    'options': options,
-                    'is_multiple_choice': is_multiple,
-                    'select_count': select_count
+            if kind == 'answer':
+                result = parse_ai_answer(content)
+                answers.append({
+                    'question_id': question_id,
+                    'correct_answers': result.get('correctAnswers', []),
+                    'explanation': result.get('explanation', ''),
+                    'created_at': now
                 })
+            elif kind == 'explanation':
+                explanations.append({'question_id': question_id, 'explanation_ru': content})
+            elif kind == 'translation':
+                options = options_by_id.get(question_id)
+                parsed = parse_bundle_response(content, [split_option(o) for o in options]) if options else None
+                if not parsed:
+                    counts['failed'] += 1
+                    continue
+                translations.append({
+                    'question_id': question_id,
+                    'language': lang,
+                    'question_text': parsed[0],
+                    'options': parsed[1],
+                    'created_at': now
+                })
+            else:
+                counts['failed'] += 1
+                continue
+            
+            counts[kind] += 1
+        
+        flush()
     
-    return parsed_questions
+    question_cache.invalidate()
+    question_sampler.invalidate()
+    return counts
 
 # ============================================
 # API ROUTES
 # ============================================
 @app.route('/api/questions/paginated', methods=['GET'])
 def get_paginated_questions():
+    """
+    Page through questions. Classic mode uses page/per_page (OFFSET + COUNT).
+    Passing `cursor` (empty for the first page) switches to keyset mode
+    ordered by (number, id) - see get_keyset_page.
+    """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 12, type=int)
     search = request.args.get('search', '')
     lang = request.args.get('lang', 'en')
     
     query = Question.query
+    ts_query = build_search_query(search) if search else None
+    
+    if ts_query is not None:
+        # Full-text match on stem, options and translations
+        query = query.filter(Question.search_vector.op('@@')(ts_query))
     
-    if search:
-        query = query.filter(Question.question.ilike(f'%{search}%'))
+    if 'cursor' in request.args:
+        return get_keyset_page(query, search, ts_query, per_page, lang)
+    
+    if ts_query is not None:
+        # Best matches first
+        rank = func.ts_rank_cd(Question.search_vector, ts_query)
+        query = query.order_by(rank.desc(), Question.number)
+    else:
+        query = query.order_by(Question.number)
     
-    pagination = query.order_by(Question.number).paginate(
+    pagination = query.paginate(
         page=page, per_page=per_page, error_out=False
     )
     
-    questions = [q.to_dict(lang) for q in pagination.items]
+    questions = serialize_questions(pagination.items, lang)
+    add_search_snippets(questions, ts_query)
     
     return jsonify({
         'questions': questions,
@@ -642,45 +2681,147 @@ def get_paginated_questions():
         'hasPrev': pagination.has_prev
     })
 
+def get_keyset_page(query, search, ts_query, per_page, lang):
+    """
+    Keyset page: WHERE (number, id) > cursor ORDER BY number, id LIMIT n+1,
+    so deep pages cost the same as the first. `total` is controlled by
+    ?total=cached (default) | estimate | none.
+    """
+    per_page = max(1, min(per_page, 100))
+    try:
+        cursor = decode_cursor(request.args.get('cursor', ''))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # `query` stays unfiltered by the cursor: the total is counted from it
+    key = tuple_(Question.number, Question.id)
+    if cursor and cursor[2] == 'prev':
+        rows = query.filter(key < (cursor[0], cursor[1])).order_by(
+            Question.number.desc(), Question.id.desc()
+        ).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_next, has_prev = True, has_more
+    else:
+        page_query = query.filter(key > (cursor[0], cursor[1])) if cursor else query
+        rows = page_query.order_by(Question.number, Question.id).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        has_next, has_prev = has_more, cursor is not None
+    
+    questions = serialize_questions(rows, lang)
+    add_search_snippets(questions, ts_query)
+    
+    total_mode = request.args.get('total', 'cached')
+    if total_mode == 'none':
+        total = None
+    elif total_mode == 'estimate' and ts_query is None:
+        total = estimate_question_count()
+    else:
+        total = question_totals.get(search, lambda: query.order_by(None).count())
+    
+    return jsonify({
+        'questions': questions,
+        'total': total,
+        'perPage': per_page,
+        'hasNext': has_next,
+        'hasPrev': has_prev,
+        'nextCursor': encode_cursor(rows[-1].number, rows[-1].id, 'next') if rows and has_next else None,
+        'prevCursor': encode_cursor(rows[0].number, rows[0].id, 'prev') if rows and has_prev else None
+    })
+
+# Questions inserted per transaction during streaming upload
+UPLOAD_CHUNK_SIZE = 1000
+
 @app.route('/api/questions/upload', methods=['POST'])
 def upload_questions():
+    """
+    Import a Telegram export (result.json). The body is parsed incrementally
+    and inserted in chunks, so memory stays flat regardless of export size.
+    With ?progress=1 the response is NDJSON: one line per chunk, then the summary.
+    """
+    if not request.content_length:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    stats = {'parsed': 0, 'new': 0, 'duplicates': 0, 'bytesRead': 0, 'bytesTotal': request.content_length}
+    
+    reader = JSONStreamReader(request.stream)
+    
+    # Optional MinHash check against the existing bank (reported, not blocking)
+    near_duplicates = []
+    check_near = bool(request.args.get('near_duplicates'))
+    if check_near:
+        # Shared bank index is read-only; this upload's own rows go in a local one
+        bank_index, bank_fingerprints = near_duplicate_indexes.get()
+        upload_index = MinHashLSH(threshold=bank_index.threshold)
+        upload_fingerprints = set()
+    
+    def run_import():
+        messages = iter_telegram_messages(reader)
+        for chunk in chunked(iter_parsed_questions(messages), UPLOAD_CHUNK_SIZE):
+            if check_near:
+                for q in chunk:
+                    # Exact fingerprint matches are already counted as duplicates
+                    if q['fingerprint'] in bank_fingerprints or q['fingerprint'] in upload_fingerprints:
+                        continue
+                    signature = bank_index.signature(q['question'], q['options'])
+                    matches = sorted(
+                        (m for m in bank_index.query(signature) + upload_index.query(signature) if m[0] != q['id']),
+                        key=lambda m: -m[1]
+                    )
+                    if matches:
+                        near_duplicates.append({'id': q['id'], 'number': q['number'],
+                                                'matchId': matches[0][0], 'similarity': round(matches[0][1], 2)})
+                    upload_index.add(q['id'], signature)
+                    upload_fingerprints.add(q['fingerprint'])
+            new_count, existing_count = bulk_insert_questions(chunk)
+            db.session.commit()
+            stats['parsed'] += len(chunk)
+            stats['new'] += new_count
+            stats['duplicates'] += existing_count
+            stats['bytesRead'] = reader.bytes_read
+            logger.info(f"Upload progress: {stats['parsed']} parsed, {stats['new']} new")
+            yield dict(stats)
+        question_cache.invalidate()
+        question_sampler.invalidate()
+        question_totals.invalidate()
+    
+    def summary():
+        result = {
+            'message': 'Successfully processed!',
+            'new': stats['new'],
+            'duplicates': stats['duplicates'],
+            # Planner estimate - no full COUNT(*) per upload
+            'total': estimate_question_count(),
+            'totalIsEstimate': True
+        }
+        if check_near:
+            result['nearDuplicates'] = len(near_duplicates)
+            result['nearDuplicateSamples'] = near_duplicates[:20]
+        return result
+    
+    if request.args.get('progress'):
+        def generate():
+            try:
+                for progress in run_import():
+                    yield json.dumps(progress) + '\n'
+                if not stats['parsed']:
+                    yield json.dumps({'error': 'No questions found in file'}) + '\n'
+                else:
+                    yield json.dumps(summary()) + '\n'
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Upload error: {e}")
+                yield json.dumps({'error': str(e)}) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        parsed_questions = parse_telegram_json(data)
-        if not parsed_questions:
+        for _ in run_import():
+            pass
+        if not stats['parsed']:
             return jsonify({'error': 'No questions found in file'}), 400
         
-        new_count = 0
-        existing_count = 0
-        
-        for q_data in parsed_questions:
-            existing = db.session.get(Question, q_data['id'])
-            if not existing:
-                question = Question(
-                    id=q_data['id'],
-                    number=q_data['number'],
-                    question=q_data['question'],
-                    options=q_data['options'],
-                    is_multiple_choice=q_data['is_multiple_choice'],
-                    select_count=q_data['select_count']
-                )
-                db.session.add(question)
-                new_count += 1
-            else:
-                existing_count += 1
-        
-        db.session.commit()
-        total = Question.query.count()
-        
-        return jsonify({
-            'message': 'Successfully processed!',
-            'new': new_count,
-            'duplicates': existing_count,
-            'total': total
-        })
+        return jsonify(summary())
         
     except Exception as e:
         db.session.rollback()
@@ -689,9 +2830,18 @@ def upload_questions():
 
 @app.route('/api/questions/random', methods=['GET'])
 def get_random_question():
-    from sqlalchemy import func
+    """
+    Random question in O(1) from the in-memory id array.
+    ?exclude=id1,id2 skips already seen questions;
+    ?cached_only=1 only picks questions that already have an AI answer.
+    """
     lang = request.args.get('lang', 'en')
-    question = Question.query.order_by(func.random()).first()
+    exclude = set(filter(None, request.args.get('exclude', '').split(',')))
+    cached_only = request.args.get('cached_only') in ('1', 'true')
+    
+    question_sampler.refresh_if_stale()
+    question_id = question_sampler.pick(exclude, cached_only)
+    question = db.session.get(Question, question_id) if question_id else None
     
     if not question:
         return jsonify({'error': 'No questions available'}), 404
@@ -699,91 +2849,71 @@ def get_random_question():
     return jsonify(question.to_dict(lang))
 
 @app.route('/api/ai/check-answer', methods=['POST'])
-@rate_limit
+@rate_limit(requests_per_minute=60)
 def check_answer():
     """
     Check answer using AI with proper concurrency control.
-    Uses locking to prevent duplicate AI calls for the same question.
+    Only one request per question (across all workers) calls OpenAI;
+    others wait up to AI_WAIT_TIMEOUT and then get a 202 to poll again.
+    With AI_JOB_QUEUE enabled the work is handed to the job worker instead.
     """
     try:
         data = request.get_json()
         question_id = data.get('questionId')
         lang = data.get('lang', 'en')
         
-        if not question_id:
+        if not question_id or not isinstance(question_id, str):
             return jsonify({'error': 'Question ID required'}), 400
+        if lang not in JOB_LANGS[JOB_AI_ANSWER]:
+            return jsonify({'error': f'Unsupported language: {lang}'}), 400
         
         # FIRST: Check cache (fast path, no lock needed)
         cache = db.session.get(AICache, question_id)
         if cache:
             # Handle Russian translation if needed
             if lang == 'ru' and not cache.explanation_ru:
-                # Use lock for translation update
-                lock = get_processing_lock(f"translate_{question_id}")
-                with lock:
-                    # Re-check after acquiring lock
-                    db.session.refresh(cache)
-                    if not cache.explanation_ru:
-                        try:
-                            cache.explanation_ru = translate_text(cache.explanation, 'explanation')
-                            db.session.commit()
-                        except Exception as e:
-                            logger.error(f'Translation error: {e}')
-                            db.session.rollback()
+                if AI_JOB_QUEUE:
+                    # Done without explanation_ru: serve the English fallback
+                    return queued_ai_response(JOB_AI_ANSWER, question_id, lang) or jsonify(cache.to_dict(lang))
+                
+                # One worker translates the explanation, the rest wait briefly
+                key = f"translate_{question_id}"
+                if not claim_ai_work(key):
+                    translated = wait_for_ai_cache(question_id, AI_WAIT_TIMEOUT, lang)
+                    return jsonify(translated.to_dict(lang)) if translated else ai_pending_response(question_id)
+                try:
+                    cache = generate_ai_cache(question_id, lang)
+                except Exception as e:
+                    logger.error(f'Translation error: {e}')
+                    db.session.rollback()
+                    cache = db.session.get(AICache, question_id)
+                finally:
+                    release_ai_work(key)
             
             return jsonify(cache.to_dict(lang))
         
-        # SECOND: Acquire lock for AI processing
-        lock = get_processing_lock(question_id)
-        
-        with lock:
-            # Re-check cache after acquiring lock (another request might have created it)
+        if AI_JOB_QUEUE:
+            response = queued_ai_response(JOB_AI_ANSWER, question_id, lang)
+            if response is not None:
+                return response
             cache = db.session.get(AICache, question_id)
+            return jsonify(cache.to_dict(lang)) if cache else ai_pending_response(question_id)
+        
+        # SECOND: Claim the question, or wait for whoever has it
+        if not claim_ai_work(question_id):
+            cache = wait_for_ai_cache(question_id, AI_WAIT_TIMEOUT)
             if cache:
                 return jsonify(cache.to_dict(lang))
-            
-            # Get question
-            question = db.session.get(Question, question_id)
-            if not question:
-                return jsonify({'error': 'Question not found'}), 404
-            
-            logger.info(f"Processing AI request for question {question_id}")
-            
-            # Get AI answer
-            result = get_ai_answer(
-                question.question,
-                question.options,
-                question.is_multiple_choice,
-                question.select_count
-            )
-            
-            # Translate if needed
-            explanation_ru = None
-            if lang == 'ru':
-                try:
-                    explanation_ru = translate_text(result['explanation'], 'explanation')
-                except Exception as e:
-                    logger.error(f'Translation error: {e}')
-            
-            # Save to cache with proper error handling
-            try:
-                cache = AICache(
-                    question_id=question_id,
-                    correct_answers=result['correctAnswers'],
-                    explanation=result['explanation'],
-                    explanation_ru=explanation_ru
-                )
-                db.session.add(cache)
-                db.session.commit()
-                logger.info(f"Cached AI result for question {question_id}")
-            except IntegrityError:
-                # Another request already saved this - fetch it
-                db.session.rollback()
-                cache = db.session.get(AICache, question_id)
-                if not cache:
-                    raise Exception("Failed to save or retrieve cache")
-            
-            return jsonify(cache.to_dict(lang))
+            return ai_pending_response(question_id)
+        
+        try:
+            cache = generate_ai_cache(question_id, lang)
+        except LookupError:
+            return jsonify({'error': 'Question not found'}), 404
+        finally:
+            release_ai_work(question_id)
+        
+        return jsonify(cache.to_dict(lang))
         
     except Exception as e:
         db.session.rollback()
@@ -791,14 +2921,14 @@ def check_answer():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/ai/translate-question', methods=['POST'])
-@rate_limit
+@rate_limit(requests_per_minute=30)
 def translate_question():
     """Translate question to Russian with concurrency control"""
     try:
         data = request.get_json()
         question_id = data.get('questionId')
         
-        if not question_id:
+        if not question_id or not isinstance(question_id, str):
             return jsonify({'error': 'Question ID required'}), 400
         
         logger.info(f"Translation request for question: {question_id}")
@@ -816,91 +2946,32 @@ def translate_question():
                 'options': existing.options
             })
         
-        # Acquire lock for translation
-        lock = get_processing_lock(f"q_translate_{question_id}")
+        if AI_JOB_QUEUE:
+            # A done job always leaves a translation, so None is only a race - poll again
+            return queued_ai_response(JOB_TRANSLATION, question_id, 'ru') or ai_pending_response(question_id)
         
-        with lock:
-            # Re-check after lock
-            existing = Translation.query.filter_by(
-                question_id=question_id,
-                language='ru'
-            ).first()
-            
-            if existing:
-                logger.info(f"Translation created while waiting for lock: {question_id}")
-                return jsonify({
-                    'question': existing.question_text,
-                    'options': existing.options
-                })
-            
-            # Get original question
-            question = db.session.get(Question, question_id)
-            if not question:
+        # One worker translates, the rest wait briefly and then poll
+        key = f"q_translate_{question_id}"
+        if not claim_ai_work(key):
+            translation = wait_for_ai_result(
+                lambda: Translation.query.filter_by(question_id=question_id, language='ru').first(),
+                AI_WAIT_TIMEOUT
+            )
+            if not translation:
+                return ai_pending_response(question_id)
+        else:
+            try:
+                translation = generate_translation(question_id, 'ru')
+            except LookupError:
                 logger.error(f"Question not found: {question_id}")
                 return jsonify({'error': 'Question not found'}), 404
-            
-            logger.info(f"Translating question {question_id}")
-            
-            # Translate question
-            translated_question = translate_text(question.question, 'question')
-            
-            # Translate options
-            translated_options = []
-            for opt in question.options:
-                try:
-                    # Extract letter and text more safely
-                    # Format is usually "A) text" or "A) text"
-                    if len(opt) > 3 and opt[1:3] in [') ', '). ']:
-                        letter = opt[0]
-                        text = opt[2:].strip() if opt[1] == ')' else opt[3:].strip()
-                    else:
-                        # Fallback - just translate as is
-                        logger.warning(f"Unusual option format: {opt[:20]}...")
-                        letter = opt[0] if len(opt) > 0 else 'A'
-                        text = opt[3:] if len(opt) > 3 else opt
-                    
-                    # Clean the text
-                    text = text.replace('Your responses:', '').replace('Your response:', '').strip()
-                    
-                    # Translate
-                    translated = translate_text(text, 'question')
-                    translated_options.append(f"{letter}) {translated}")
-                    
-                except Exception as e:
-                    logger.error(f"Error translating option '{opt[:50]}...': {e}")
-                    # Use original if translation fails
-                    translated_options.append(opt)
-            
-            # Save translation
-            try:
-                translation = Translation(
-                    question_id=question_id,
-                    language='ru',
-                    question_text=translated_question,
-                    options=translated_options
-                )
-                db.session.add(translation)
-                db.session.commit()
-                logger.info(f"Translation saved for {question_id}")
-            except IntegrityError:
-                db.session.rollback()
-                logger.warning(f"Translation already exists (race condition): {question_id}")
-                existing = Translation.query.filter_by(
-                    question_id=question_id,
-                    language='ru'
-                ).first()
-                if existing:
-                    return jsonify({
-                        'question': existing.question_text,
-                        'options': existing.options
-                    })
-                else:
-                    raise Exception("Failed to save or retrieve translation")
-            
-            return jsonify({
-                'question': translated_question,
-                'options': translated_options
-            })
+            finally:
+                release_ai_work(key)
+        
+        return jsonify({
+            'question': translation.question_text,
+            'options': translation.options
+        })
         
     except Exception as e:
         db.session.rollback()
@@ -989,6 +3060,52 @@ def translate_question():
         return jsonify({'error': str(e)}), 500
     
 
+@app.route('/api/jobs', methods=['POST'])
+@rate_limit(requests_per_minute=60)
+def create_job():
+    """Enqueue an AI job; returns immediately with the job to poll"""
+    data = request.get_json() or {}
+    question_id = data.get('questionId')
+    
+    if not question_id:
+        return jsonify({'error': 'Question ID required'}), 400
+    
+    try:
+        job = enqueue_job(data.get('type', JOB_AI_ANSWER), question_id, data.get('lang'))
+        return jsonify(job.to_dict()), 202
+    except LookupError:
+        return jsonify({'error': 'Question not found'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f'Enqueue error: {e}')
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Poll job status; finished jobs include their result"""
+    job = db.session.get(AIJob, job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    data = job.to_dict()
+    if job.status == 'done':
+        if job.job_type == JOB_AI_ANSWER:
+            cache = db.session.get(AICache, job.question_id)
+            data['result'] = cache.to_dict(job.lang) if cache else None
+        else:
+            translation = Translation.query.filter_by(
+                question_id=job.question_id,
+                language=job.lang
+            ).first()
+            data['result'] = {
+                'question': translation.question_text,
+                'options': translation.options
+            } if translation else None
+    
+    return jsonify(data)
+
 @app.route('/api/questions/<question_id>', methods=['GET'])
 def get_question_by_id(question_id):
     """Get specific question by ID"""
@@ -998,7 +3115,11 @@ def get_question_by_id(question_id):
     if not question:
         return jsonify({'error': 'Question not found'}), 404
     
-    return jsonify(question.to_dict(lang))
+    # Payload depends on the question, its translation and AI cache rows;
+    # hashing the prepared payload covers all three
+    data = question.to_dict(lang)
+    etag = make_etag('question', json.dumps(data, sort_keys=True))
+    return conditional_json(lambda: data, etag)
 
 @app.route('/api/ai-cache/<question_id>', methods=['GET'])
 def get_ai_cache(question_id):
@@ -1008,7 +3129,9 @@ def get_ai_cache(question_id):
     if not cache:
         return jsonify({'error': 'Not found'}), 404
     
-    return jsonify(cache.to_dict(lang))
+    # Row version: created once, only explanation_ru is filled in later
+    etag = make_etag('ai-cache', question_id, lang, cache.created_at, cache.explanation_ru is not None)
+    return conditional_json(lambda: cache.to_dict(lang), etag, last_modified=cache.created_at)
 
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
@@ -1024,6 +3147,7 @@ def get_stats():
     })
 
 @app.route('/api/health', methods=['GET'])
+@no_compression
 def health_check():
     """Health check endpoint for Railway"""
     try:
@@ -1032,6 +3156,13 @@ def health_check():
         return jsonify({
             'status': 'healthy',
             'database': 'connected',
+            'ipDenyCache': denied_ip_cache.stats(),
+            'memory': {
+                'rateLimitKeys': ai_rate_limiter.size(),
+                'processingLocks': len(processing_locks),
+                'questionCacheEntries': len(question_cache.entries),
+                'deniedIpEntries': len(denied_ip_cache.entries)
+            },
             'timestamp': datetime.utcnow().isoformat()
         })
     except Exception as e:
@@ -1048,7 +3179,7 @@ def blocked_page():
     """Page shown to blocked IPs"""
     client_ip = get_client_ip()
     # Serve the blocked.html file
-    return send_from_directory(app.static_folder, 'blocked.html')
+    return send_static_asset('blocked.html')
 
 @app.route('/admin/login')
 def admin_login_page():
@@ -1143,7 +3274,7 @@ def admin_required(f):
 def admin_panel():
     """Admin panel for managing IPs"""
     # Serve the admin.html file
-    return send_from_directory(app.static_folder, 'admin.html')
+    return send_static_asset('admin.html')
 
 @app.route('/admin/api/current-ip', methods=['GET'])
 @admin_required
@@ -1185,10 +3316,11 @@ def admin_ips():
         is_active=True
     )
     db.session.add(new_ip)
+    notify_ip_allowlist_changed()
     db.session.commit()
     
-    # Add to in-memory cache
-    allowed_ips.add(ip_address)
+    # Update this worker right away, others follow via NOTIFY
+    refresh_ip_allowlist()
     
     return jsonify(new_ip.to_dict()), 201
 
@@ -1201,24 +3333,22 @@ def admin_ip_detail(ip_id):
         return jsonify({'error': 'IP not found'}), 404
     
     if request.method == 'DELETE':
-        # Remove from cache
-        allowed_ips.discard(ip.ip_address)
         db.session.delete(ip)
+        notify_ip_allowlist_changed()
         db.session.commit()
+        refresh_ip_allowlist()
         return jsonify({'success': True})
     
     # PATCH - update
     data = request.get_json()
     if 'is_active' in data:
         ip.is_active = data['is_active']
-        if data['is_active']:
-            allowed_ips.add(ip.ip_address)
-        else:
-            allowed_ips.discard(ip.ip_address)
     if 'description' in data:
         ip.description = data['description']
     
+    notify_ip_allowlist_changed()
     db.session.commit()
+    refresh_ip_allowlist()
     return jsonify(ip.to_dict())
 
 @app.cli.command()
@@ -1226,28 +3356,523 @@ def init_db():
     db.create_all()
     print("Database initialized!")
 
+@app.cli.command()
+def migrate_db():
+    """Apply schema upgrades (fingerprints, full-text search) to an existing database"""
+    db.create_all()
+    ensure_question_fingerprints(force=True)
+    ensure_search_index(force=True)
+    print("Database migrated!")
+
+class TokenBudget:
+    """Token bucket for a global tokens-per-minute budget shared by warm-up threads"""
+    def __init__(self, tokens_per_minute):
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = tokens_per_minute
+        self.tokens = tokens_per_minute
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, tokens):
+        """Block until `tokens` are available"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+def estimate_warm_tokens(text_length, lang):
+    """Rough token estimate for warming one question (~4 chars per token)"""
+    # Prompt + answer/explanation; Russian adds explanation and question translations
+    tokens = text_length // 4 + 600
+    if lang == 'ru':
+        tokens += text_length // 2 + 1200
+    return tokens
+
+def warm_question(question_id, lang):
+    """Fill AICache (and Translation for non-English) for one question"""
+    with app.app_context():
+        try:
+            generate_ai_cache(question_id, lang)
+            if lang != 'en':
+                generate_translation(question_id, lang)
+        finally:
+            db.session.remove()
+
+@app.cli.command()
+@click.option('--lang', default='en', type=click.Choice(['en', 'ru']), help='Also fill Russian translations')
+@click.option('--concurrency', default=4, show_default=True, help='Parallel OpenAI calls')
+@click.option('--tokens-per-minute', default=150000, show_default=True, help='Global token budget')
+@click.option('--limit', default=0, help='Stop after N questions (0 = all)')
+@click.option('--checkpoint', default='.warm_cache_checkpoint.json', show_default=True, help='Resume file')
+@click.option('--resume/--no-resume', default=True, show_default=True)
+def warm_cache(lang, concurrency, tokens_per_minute, limit, checkpoint, resume):
+    """Pre-fill AICache and translations for uncached questions"""
+    start_after = None
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('lang') == lang:
+            start_after = (saved['number'], saved['id'])
+            print(f"Resuming after question #{saved['number']} ({saved['id']})")
+    
+    query = db.session.query(
+        Question.id, Question.number, func.length(Question.question)
+    ).outerjoin(AICache, AICache.question_id == Question.id)
+    if lang == 'en':
+        query = query.filter(AICache.question_id.is_(None))
+    else:
+        query = query.outerjoin(Translation, and_(
+            Translation.question_id == Question.id,
+            Translation.language == lang
+        )).filter(or_(
+            AICache.question_id.is_(None),
+            AICache.explanation_ru.is_(None),
+            Translation.id.is_(None)
+        ))
+    if start_after:
+        query = query.filter(tuple_(Question.number, Question.id) > start_after)
+    pending = query.order_by(Question.number, Question.id).all()
+    db.session.rollback()
+    if limit:
+        pending = pending[:limit]
+    
+    total = len(pending)
+    print(f"{total} questions to warm (lang={lang}, concurrency={concurrency}, budget={tokens_per_minute} tpm)")
+    if not total:
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        return
+    
+    budget = TokenBudget(tokens_per_minute)
+    done = failed = 0
+    # Resume point: only ever moves past an unbroken run of successes
+    last_contiguous = None
+    started = time.monotonic()
+    batch_size = concurrency * 4
+    
+    def submit(executor, row):
+        question_id, _, text_length = row
+        budget.acquire(estimate_warm_tokens(text_length or 0, lang))
+        return executor.submit(warm_question, question_id, lang)
+    
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='warm') as executor:
+        # Batches complete in order, so the checkpoint never skips unfinished
+        # or failed work - an interrupted run resumes at the first gap
+        for offset in range(0, total, batch_size):
+            batch = pending[offset:offset + batch_size]
+            futures = [(row, submit(executor, row)) for row in batch]
+            for row, future in futures:
+                try:
+                    future.result()
+                    done += 1
+                    if failed == 0:
+                        last_contiguous = row
+                except Exception as e:
+                    failed += 1
+                    logger.error(f"Warm-up failed for {row[0]}: {e}")
+            
+            if last_contiguous is not None:
+                last_id, last_number, _ = last_contiguous
+                with open(checkpoint, 'w', encoding='utf-8') as f:
+                    json.dump({'lang': lang, 'number': last_number, 'id': last_id}, f)
+            
+            elapsed = time.monotonic() - started
+            processed = done + failed
+            print(f"[{processed}/{total}] ok={done} failed={failed} "
+                  f"{processed / elapsed * 60:.1f} questions/min")
+    
+    # Run completed: the uncached-only query makes the next run pick up
+    # failures and new uploads, so the resume point is no longer needed
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    
+    print(f"Warm-up finished: {done} ok, {failed} failed in {time.monotonic() - started:.0f}s")
+
+@app.cli.command()
+@click.option('--lang', default='en', type=click.Choice(['en', 'ru']), help='Also request Russian translations')
+@click.option('--transport', default='openai', type=click.Choice(sorted(BATCH_TRANSPORTS)), show_default=True)
+@click.option('--output', default='enrichment_batch.jsonl', show_default=True, help='Batch request file')
+@click.option('--batch-id', default=None, help='Resume polling an already submitted batch')
+@click.option('--poll-interval', default=60, show_default=True, help='Seconds between status checks')
+def enrich_batch(lang, transport, output, batch_id, poll_interval):
+    """Offline enrichment: fill AICache/translations for all uncached questions in one batch"""
+    client = BATCH_TRANSPORTS[transport]()
+    
+    if not batch_id:
+        written = 0
+        with open(output, 'w', encoding='utf-8') as f:
+            for req in build_batch_requests(lang):
+                f.write(json.dumps(req, ensure_ascii=False) + '\n')
+                written += 1
+        db.session.rollback()
+        print(f"Wrote {written} requests to {output}")
+        if not written:
+            return
+        batch_id = client.submit(output)
+        print(f"Submitted batch {batch_id}")
+    
+    while True:
+        info = client.status(batch_id)
+        state = info.get('status')
+        print(f"Batch {batch_id}: {state} {info.get('request_counts', '')}")
+        if state in BATCH_DONE_STATES:
+            break
+        time.sleep(poll_interval)
+    
+    if state != 'completed':
+        print(f"Batch ended with status {state}; partial results (if any) will be applied")
+    
+    counts = apply_batch_results(client.results(info), lang)
+    print(f"Applied: {counts}")
+
+def make_fake_telegram_export(count, seed=42):
+    """Synthetic Telegram export with `count` question messages (for benchmarks)"""
+    rng = random.Random(seed)
+    messages = []
+    for n in range(1, count + 1):
+        select = rng.choice([1, 1, 1, 2])
+        stem = f"Which AWS service fits scenario {n}-{rng.random():.8f}?"
+        if select > 1:
+            stem += f" (Select {select})"
+        options = '\n'.join(f"{letter}) Option {letter} for question {n}" for letter in 'ABCDE')
+        messages.append({'id': n, 'type': 'message', 'text': f"Question #{n}\n\n{stem}\n\n{options}"})
+    return {'name': 'benchmark', 'messages': messages}
+
+@app.cli.command()
+@click.option('--count', default=10000, show_default=True, help='Questions in the synthetic export')
+@click.option('--chunk-size', default=1000, show_default=True)
+def bench_upload(count, chunk_size):
+    """Benchmark parse + bulk insert of a synthetic upload (rolled back afterwards)"""
+    data = make_fake_telegram_export(count)
+    
+    started = time.perf_counter()
+    parsed = parse_telegram_json(data)
+    parse_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    try:
+        first = bulk_insert_questions(parsed, chunk_size)
+        first_time = time.perf_counter() - started
+        
+        # Second pass: everything is a duplicate
+        started = time.perf_counter()
+        second = bulk_insert_questions(parsed, chunk_size)
+        second_time = time.perf_counter() - started
+    finally:
+        db.session.rollback()
+    
+    print(f"parse:        {len(parsed)} questions in {parse_time:.3f}s ({len(parsed) / parse_time:.0f}/s)")
+    print(f"insert (new): new={first[0]} dup={first[1]} in {first_time:.3f}s ({len(parsed) / first_time:.0f}/s)")
+    print(f"insert (dup): new={second[0]} dup={second[1]} in {second_time:.3f}s ({len(parsed) / second_time:.0f}/s)")
+
+@app.cli.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--processes', default=0, help='Parser processes (0 = parse in this process)')
+def import_export(path, processes):
+    """Import a Telegram export file from disk (streaming, optionally multi-process)"""
+    started = time.monotonic()
+    stats = {'parsed': 0, 'new': 0, 'duplicates': 0}
+    
+    with open(path, 'rb') as f:
+        reader = JSONStreamReader(f)
+        messages = iter_telegram_messages(reader)
+        if processes:
+            parsed = iter_parsed_questions_parallel(messages, processes)
+        else:
+            parsed = iter_parsed_questions(messages)
+        
+        for chunk in chunked(parsed, UPLOAD_CHUNK_SIZE):
+            new_count, existing_count = bulk_insert_questions(chunk)
+            db.session.commit()
+            stats['parsed'] += len(chunk)
+            stats['new'] += new_count
+            stats['duplicates'] += existing_count
+            print(f"[{reader.bytes_read / 1e6:.1f} MB] parsed={stats['parsed']} new={stats['new']}")
+    
+    question_cache.invalidate()
+    question_sampler.invalidate()
+    question_totals.invalidate()
+    print(f"Imported in {time.monotonic() - started:.1f}s: {stats}")
+
+@app.cli.command()
+@click.option('--count', default=50000, show_default=True, help='Messages in the synthetic export')
+@click.option('--processes', default=multiprocessing.cpu_count(), show_default=True)
+def bench_parser(count, processes):
+    """Micro-benchmark Telegram parsing: legacy uncompiled regexes vs current parser vs process pool"""
+    def legacy_parse(msg):
+        # Reference: the previous implementation (four uncompiled scans per message)
+        text_content = msg.get('text')
+        if not text_content:
+            return None
+        question_match = re.search(r'Question #(\d+)\n\n(.+?)\n\n([A-Z]\).+)', text_content, re.DOTALL)
+        if not question_match:
+            return None
+        question_text = question_match.group(2)
+        is_multiple = bool(re.search(r'\(Select \d+\)', question_text))
+        select_count_match = re.search(r'\(Select (\d+)\)', question_text)
+        option_matches = re.findall(r'([A-Z])\)\s*(.+?)(?=\n[A-Z]\)|$)', question_match.group(3), re.DOTALL)
+        options = [f"{letter}) {text.strip()}" for letter, text in option_matches]
+        return {
+            'number': int(question_match.group(1)),
+            'question': question_text.strip(),
+            'options': options,
+            'is_multiple_choice': is_multiple,
+            'select_count': int(select_count_match.group(1)) if select_count_match else 1
+        }
+    
+    messages = make_fake_telegram_export(count)['messages']
+    
+    def run(name, fn):
+        started = time.perf_counter()
+        results = fn()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<14} {len(results)} questions in {elapsed:.3f}s ({count / elapsed:,.0f} messages/s)")
+        return results
+    
+    legacy = run('legacy', lambda: [q for q in map(legacy_parse, messages) if q])
+    current = run('precompiled', lambda: list(iter_parsed_questions(messages)))
+    run(f'pool x{processes}', lambda: list(iter_parsed_questions_parallel(messages, processes)))
+    
+    fields = ('number', 'question', 'options', 'is_multiple_choice', 'select_count')
+    mismatches = sum(
+        1 for old, new in zip(legacy, current)
+        if [old[f] for f in fields] != [new[f] for f in fields]
+    ) + abs(len(legacy) - len(current))
+    print(f"output mismatches vs legacy: {mismatches}")
+
+@app.cli.command()
+@click.option('--threshold', default=0.7, show_default=True, help='Minimum estimated Jaccard similarity')
+def find_near_duplicates(threshold):
+    """Report near-duplicate questions in the bank (MinHash/LSH)"""
+    index = MinHashLSH(threshold=threshold)
+    pairs = 0
+    for question_id, number, question_text, options in db.session.query(
+        Question.id, Question.number, Question.question, Question.options
+    ).order_by(Question.number).yield_per(1000):
+        signature = index.signature(question_text, options)
+        for match_id, score in index.query(signature):
+            pairs += 1
+            print(f"{score:.2f}  #{number} {question_id}  ~  {match_id}")
+        index.add(question_id, signature)
+    print(f"{pairs} near-duplicate pairs across {len(index.signatures)} questions")
+
+@app.cli.command()
+def run_jobs():
+    """Process queued AI jobs (run as a separate worker process)"""
+    print("Job worker started")
+    while True:
+        try:
+            job = claim_next_job()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to claim job: {e}")
+            time.sleep(5)
+            continue
+        
+        if job is None:
+            time.sleep(1)
+            continue
+        
+        started = time.monotonic()
+        run_job(job)
+        logger.info(f"Job {job.id} {job.job_type} {job.question_id} -> {job.status} in {time.monotonic() - started:.1f}s")
+
+# ============================================
+# STATIC ASSETS
+# ============================================
+# Content-hashed, precompressed copies of dist/ (see `flask build-assets`)
+STATIC_BUILD_DIR = os.getenv('STATIC_BUILD_DIR', 'dist_build')
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Only compress text-like assets, and only keep variants that are smaller
+STATIC_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# HTML references (href="style.css", src="main.js") rewritten to hashed names
+STATIC_REFERENCE_RE = re.compile(r'((?:href|src)=")([^"/:?#]+)(")')
+
+def write_static_file(path, data):
+    """Write via temp file + rename; hashed names make existing files reusable"""
+    if os.path.exists(path):
+        return
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def static_variant_paths(target, asset):
+    """Files a manifest entry refers to: the hashed copy and its compressed variants"""
+    path = os.path.join(target, asset['hashed'])
+    return [path] + [path + ('.br' if encoding == 'br' else '.gz') for encoding in asset['encodings']]
+
+def build_static_assets(source=None, target=STATIC_BUILD_DIR):
+    """
+    Write `<name>.<hash><ext>` plus .gz/.br variants of every file in dist/
+    into `target` and return the manifest (also saved as manifest.json).
+    HTML is processed last so its asset references point at hashed names.
+    Entries of an existing manifest whose content hash still matches are
+    reused as-is, so restarted workers only hash dist/, never recompress.
+    """
+    source = source or app.static_folder
+    os.makedirs(target, exist_ok=True)
+    manifest_path = os.path.join(target, 'manifest.json')
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+    names = sorted(
+        os.path.relpath(os.path.join(root, name), source).replace(os.sep, '/')
+        for root, _, files in os.walk(source) for name in files
+    )
+    names.sort(key=lambda name: name.endswith('.html'))
+    
+    assets = {}
+    subresource = lambda ref: ref in assets and not ref.endswith('.html')
+    for name in names:
+        with open(os.path.join(source, name), 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        
+        if name.endswith('.html'):
+            # Pages keep linking to each other by their logical names
+            data = STATIC_REFERENCE_RE.sub(
+                lambda m: m.group(1) + (assets[m.group(2)]['hashed'] if subresource(m.group(2)) else m.group(2)) + m.group(3),
+                data.decode('utf-8')
+            ).encode('utf-8')
+        
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        cached = previous.get(name)
+        if (cached and cached['digest'] == digest and cached.get('brotli') == bool(brotli)
+                and all(os.path.exists(path) for path in static_variant_paths(target, cached))):
+            assets[name] = cached
+            continue
+        
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{digest}{ext}"
+        os.makedirs(os.path.dirname(os.path.join(target, hashed)), exist_ok=True)
+        write_static_file(os.path.join(target, hashed), data)
+        
+        encodings = []
+        if mimetype.startswith(STATIC_COMPRESSIBLE_TYPES):
+            variants = [('br', brotli.compress if brotli else None),
+                        ('gzip', lambda raw: gzip.compress(raw, 9, mtime=0))]
+            for encoding, compress in variants:
+                if compress is None:
+                    continue
+                compressed = compress(data)
+                if len(compressed) < len(data):
+                    suffix = '.br' if encoding == 'br' else '.gz'
+                    write_static_file(os.path.join(target, hashed + suffix), compressed)
+                    encodings.append(encoding)
+        
+        assets[name] = {'hashed': hashed, 'digest': digest, 'mimetype': mimetype,
+                        'encodings': encodings, 'brotli': bool(brotli)}
+    
+    if assets == previous:
+        return assets
+    tmp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(assets, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return assets
+
+class StaticAssets:
+    """Startup manifest: logical and hashed names -> files in the build dir"""
+    def __init__(self, assets, root):
+        self.root = os.path.abspath(root)
+        self.by_name = {}
+        for name, asset in assets.items():
+            entry = dict(asset, name=name, path=os.path.join(self.root, asset['hashed']))
+            self.by_name[name] = (entry, False)
+            if asset['hashed'] != name:
+                self.by_name[asset['hashed']] = (entry, True)
+    
+    def resolve(self, path):
+        """(asset, is_hashed_name) or (None, False)"""
+        return self.by_name.get(path, (None, False))
+
+def negotiate_encoding(asset):
+    """Best precompressed variant the client accepts (br > gzip), or None"""
+    for encoding in asset['encodings']:
+        if request.accept_encodings.quality(encoding) > 0:
+            return encoding
+    return None
+
+def send_static_asset(path):
+    """Serve a dist/ file from the manifest; unknown paths get None"""
+    asset, immutable = static_assets.resolve(path)
+    if asset is None:
+        return None
+    
+    encoding = negotiate_encoding(asset)
+    file_path = asset['path'] + ('.br' if encoding == 'br' else '.gz' if encoding else '')
+    response = send_file(
+        file_path,
+        mimetype=asset['mimetype'],
+        etag=f"{asset['digest']}-{encoding}" if encoding else asset['digest'],
+        conditional=True,
+        max_age=STATIC_IMMUTABLE_MAX_AGE if immutable else None
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset['encodings']:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+        response.cache_control.public = True
+    else:
+        # Logical names change content in place - always revalidate
+        response.cache_control.no_cache = True
+    return response
+
+@app.cli.command('build-assets')
+@click.option('--target', default=STATIC_BUILD_DIR, show_default=True, help='Output directory')
+def build_assets_command(target):
+    """Write hashed, precompressed copies of dist/ and their manifest"""
+    assets = build_static_assets(target=target)
+    compressed = sum(1 for asset in assets.values() if asset['encodings'])
+    click.echo(f"Built {len(assets)} assets ({compressed} precompressed, brotli {'on' if brotli else 'off'}) in {target}")
+
+def load_static_assets():
+    """Build (or reuse) the hashed assets once per worker; plain dist/ if that fails"""
+    try:
+        return StaticAssets(build_static_assets(), STATIC_BUILD_DIR)
+    except OSError as e:
+        logger.error(f"Static asset build failed, serving dist/ uncompressed: {e}")
+        plain = {}
+        for name in os.listdir(app.static_folder):
+            with open(os.path.join(app.static_folder, name), 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            plain[name] = {'hashed': name, 'digest': digest, 'encodings': [],
+                           'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream'}
+        return StaticAssets(plain, app.static_folder)
+
+static_assets = load_static_assets()
+
 # Serve frontend
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    logger.info(f"Serve request: path='{path}', static_folder='{app.static_folder}'")
-    
     if path and path.startswith('api'):
         # Let API routes handle this
         return jsonify({'error': 'Not found'}), 404
     
     try:
-        if path and os.path.exists(os.path.join(app.static_folder, path)):
-            logger.info(f"Serving file: {path}")
-            return send_from_directory(app.static_folder, path)
-        
-        index_path = os.path.join(app.static_folder, 'index.html')
-        logger.info(f"Serving index.html, exists: {os.path.exists(index_path)}")
-        return send_from_directory(app.static_folder, 'index.html')
+        response = send_static_asset(path) or send_static_asset('index.html')
+        return response if response is not None else (jsonify({'error': 'Not found'}), 404)
     except Exception as e:
         logger.error(f"Error serving {path}: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Flask's own static rule (static_url_path='') has the same pattern as the
+# catch-all and matches first, so route it through the manifest as well
+app.view_functions['static'] = lambda filename: serve(filename)
+
 # ============================================
 # AUTO-CREATE TABLES ON STARTUP
 # ============================================
@@ -1269,6 +3894,9 @@ with app.app_context():
         # Test database connection
         db.session.execute(text('SELECT 1'))
         logger.info("Database connection test: OK")
+        
+        ensure_question_fingerprints()
+        ensure_search_index()
     except Exception as e:
         # If tables already exist, that's fine
         if "already exists" in str(e) or "duplicate key" in str(e).lower():
@@ -1282,6 +3910,17 @@ with app.app_context():
             logger.error(f"Failed to initialize database: {e}")
             logger.exception("Full traceback:")
 
+# Load IP whitelist into memory and keep it in sync across workers
+refresh_ip_allowlist()
+threading.Thread(target=ip_allowlist_listener, name='ip-allowlist-listener', daemon=True).start()
+
+# Keep in-memory rate limit table bounded
+threading.Thread(target=rate_limit_sweeper, name='rate-limit-sweeper', daemon=True).start()
+
+# Hot reload of the Academo question bank
+if ACADEMO_RELOAD_SECONDS > 0:
+    threading.Thread(target=academo_reload_watcher, name='academo-reload-watcher', daemon=True).start()
+
 # ============================================
 # PRODUCTION SERVER CONFIGURATION
 # ============================================
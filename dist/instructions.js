@@ -554,7 +554,7 @@ class UploadHandler {
                     <span class="stat-label">${this.t('duplicates')}</span>
                 </div>
                 <div class="stat">
-                    <span class="stat-num">${result.total}</span>
+                    <span class="stat-num">${result.totalIsEstimate ? '~' : ''}${result.total}</span>
                     <span class="stat-label">${this.t('total')}</span>
                 </div>
             `;
@@ -13,6 +13,8 @@ let currentPage = 1;
 let perPage = 12;
 let aiResultCache = null;
 let questionAnswered = false;
+let seenQuestionIds = [];  // recent quiz questions, not repeated by /questions/random
+const SEEN_HISTORY_SIZE = 30;
 
 // Translations
 const translations = {
@@ -206,9 +208,17 @@ function debounce(func, wait) {
 
 async function apiCall(endpoint, options = {}) {
     try {
-        const response = await fetch(`${API_BASE}${endpoint}`, options);
-        if (!response.ok) throw new Error(`HTTP ${response.status}`);
-        return await response.json();
+        for (let attempt = 0; ; attempt++) {
+            const response = await fetch(`${API_BASE}${endpoint}`, options);
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            
+            // 202 = AI answer is being generated by another request, poll again
+            if (response.status !== 202 || data.status !== 'pending' || attempt >= 30) {
+                return data;
+            }
+            await new Promise(resolve => setTimeout(resolve, (data.retryAfter || 2) * 1000));
+        }
     } catch (error) {
         console.error('API Error:', error);
         showToast(t('networkError'), 'error');
@@ -435,7 +445,9 @@ async function loadRandomQuestion() {
         showLoading();
         
         // Загружаем случайный вопрос
-        const data = await apiCall(`/questions/random?lang=${currentLang}`);
+        const exclude = encodeURIComponent(seenQuestionIds.join(','));
+        const data = await apiCall(`/questions/random?lang=${currentLang}&exclude=${exclude}`);
+        seenQuestionIds = [...seenQuestionIds, data.id].slice(-SEEN_HISTORY_SIZE);
         
         // Если язык русский И нет перевода - сразу переводим
         if (currentLang === 'ru' && !data.hasTranslation) {
@@ -904,20 +916,19 @@ async function handleFileUpload(file) {
     
     try {
         showLoading();
-        const text = await file.text();
-        const json = JSON.parse(text);
         
+        // Send the file as-is; the server parses it incrementally
         const result = await apiCall('/questions/upload', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify(json)
+            body: file
         });
         
         document.getElementById('uploadResult').innerHTML = `
             <h4>✅ Upload Successful!</h4>
             <p>New questions: ${result.new}</p>
             <p>Duplicates: ${result.duplicates}</p>
-            <p>Total in database: ${result.total}</p>
+            <p>Total in database: ${result.totalIsEstimate ? '~' : ''}${result.total}</p>
         `;
         document.getElementById('uploadResult').classList.remove('hidden');
         
@@ -0,0 +1,87 @@
+"""
+Shared fixtures. The app only runs against PostgreSQL (ARRAY, tsvector,
+ON CONFLICT), so these tests need TEST_DATABASE_URL pointing at a
+throwaway database and are skipped without it.
+"""
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+if TEST_DATABASE_URL:
+    # Must be set before app.py is imported - it configures the engine at import
+    os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+    os.environ.setdefault('RATE_LIMIT_BACKEND', 'memory')
+
+SEED_COUNT = 120
+
+@pytest.fixture(scope='session')
+def app_module():
+    if not TEST_DATABASE_URL:
+        pytest.skip('TEST_DATABASE_URL not set (needs PostgreSQL)')
+    import app as app_module
+    return app_module
+
+@pytest.fixture(scope='session')
+def seeded_questions(app_module):
+    """SEED_COUNT questions, each with a ru translation; every other one AI-cached"""
+    m = app_module
+    ids = [f'test-seed-{i:04d}' for i in range(SEED_COUNT)]
+    with m.app.app_context():
+        for i, question_id in enumerate(ids):
+            m.db.session.add(m.Question(
+                id=question_id, number=900000 + i,
+                question=f'Test question {i} about EC2 instances',
+                options=['A. First option', 'B. Second option']
+            ))
+        m.db.session.commit()
+        for i, question_id in enumerate(ids):
+            m.db.session.add(m.Translation(
+                question_id=question_id, language='ru',
+                question_text=f'Тестовый вопрос {i}',
+                options=['A. Первый вариант', 'B. Второй вариант']
+            ))
+            if i % 2:
+                m.db.session.add(m.AICache(
+                    question_id=question_id, correct_answers=['A'], explanation='Because.'
+                ))
+        m.db.session.commit()
+        m.question_totals.invalidate()
+    
+    yield ids
+    
+    with m.app.app_context():
+        m.Translation.query.filter(m.Translation.question_id.in_(ids)).delete(synchronize_session=False)
+        m.AICache.query.filter(m.AICache.question_id.in_(ids)).delete(synchronize_session=False)
+        m.Question.query.filter(m.Question.id.in_(ids)).delete(synchronize_session=False)
+        m.db.session.commit()
+        m.question_totals.invalidate()
+
+@pytest.fixture
+def count_queries(app_module):
+    """Context manager collecting SQL statements run on this thread (background workers ignored)"""
+    from sqlalchemy import event
+    
+    @contextmanager
+    def collect():
+        thread_id = threading.get_ident()
+        statements = []
+        
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == thread_id:
+                statements.append(statement)
+        
+        engine = app_module.db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    
+    return collect
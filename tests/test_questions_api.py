@@ -0,0 +1,33 @@
+import pytest
+
+@pytest.mark.parametrize('lang', ['en', 'ru'])
+def test_paginated_query_count_does_not_grow_with_page_size(app_module, seeded_questions, count_queries, lang):
+    """Translations and AI cache are batch-loaded: no per-question queries"""
+    client = app_module.app.test_client()
+    counts = {}
+    for per_page in (5, 20, 50):
+        with app_module.app.app_context():
+            with count_queries() as statements:
+                response = client.get(f'/api/questions/paginated?per_page={per_page}&lang={lang}')
+        assert response.status_code == 200
+        assert len(response.get_json()['questions']) == per_page
+        counts[per_page] = len(statements)
+    
+    assert len(set(counts.values())) == 1, counts
+
+def test_keyset_total_is_the_same_on_deep_pages(app_module, seeded_questions):
+    """A cold total cache hit from page N must count all rows, not just those after the cursor"""
+    client = app_module.app.test_client()
+    
+    app_module.question_totals.invalidate()
+    first = client.get('/api/questions/paginated?cursor=&per_page=10').get_json()
+    
+    response = first
+    for _ in range(3):
+        response = client.get(f"/api/questions/paginated?cursor={response['nextCursor']}&per_page=10").get_json()
+    
+    app_module.question_totals.invalidate()
+    deep = client.get(f"/api/questions/paginated?cursor={response['nextCursor']}&per_page=10").get_json()
+    
+    assert deep['total'] == first['total']
+    assert deep['total'] >= len(seeded_questions)